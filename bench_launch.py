@@ -0,0 +1,103 @@
+"""Compare per-target exploit launch latency: Popen vs. the fork server.
+
+Usage: python3 bench_launch.py [exploit.py] [-n RUNS]
+
+Without an exploit file a stub that imports `requests` (and `pwn`, when
+installed) and prints a flag is used, which is close to what a typical
+exploit pays before it sends its first packet.
+"""
+
+import argparse
+import logging
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+import farmer
+
+STUB_EXPLOIT = """\
+import sys
+
+import requests
+
+try:
+    import pwn
+except ImportError:
+    pass
+
+print('FLAG{' + sys.argv[1] + ':' + sys.argv[2] + '}')
+"""
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench(name: str, launch, runs: int):
+    latencies: list[float] = []
+    for port in range(runs):
+        start = time.perf_counter()
+        result = launch('127.0.0.1', port)
+        latencies.append(time.perf_counter() - start)
+
+        if result.return_code != 0:
+            raise RuntimeError(f'{name} run failed: {result.err.decode()}')
+
+    latencies.sort()
+    print(
+        f'{name:<10} mean {statistics.mean(latencies) * 1000:8.2f} ms'
+        f'  p50 {latencies[len(latencies) // 2] * 1000:8.2f} ms'
+        f'  p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:8.2f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('exploit', nargs='?', help='Exploit to launch')
+    parser.add_argument('-n', '--runs', type=int, default=30, help='Runs per mode')
+    args = parser.parse_args()
+
+    farmer.logger = logging.getLogger('bench_launch')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = args.exploit
+        if not filename:
+            filename = os.path.join(tmpdir, 'stub_exploit.py')
+            with open(filename, 'w') as f:
+                _ = f.write(STUB_EXPLOIT)
+
+        print(f'Launching {filename} {args.runs} times per mode')
+
+        cpu = children_cpu()
+        bench(
+            'popen',
+            lambda ip, port: farmer.run_exploit(ip, port, filename),
+            args.runs,
+        )
+        cpu_per_run = (children_cpu() - cpu) / args.runs
+        print(f'{"":<10} child cpu/run {cpu_per_run * 1000:.2f} ms')
+
+        # Forked children are reaped by the server, so its CPU (warm-up
+        # included) only shows up here once the server itself has exited.
+        cpu = children_cpu()
+        server = farmer.ForkServer(filename)
+        start = time.perf_counter()
+        server.start()
+        print(f'fork server warm-up {(time.perf_counter() - start) * 1000:.2f} ms')
+        try:
+            bench(
+                'forkserver',
+                lambda ip, port: farmer.run_exploit_forked(server, ip, port),
+                args.runs,
+            )
+        finally:
+            server.stop()
+        cpu_per_run = (children_cpu() - cpu) / args.runs
+        print(f'{"":<10} child cpu/run {cpu_per_run * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
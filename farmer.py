@@ -1,99 +1,374 @@
+import asyncio
+import concurrent.futures
+import enum
+import errno
+import functools
+import hashlib
+import itertools
+import json
 import logging
+import math
 import os
+import queue
 import random
 import re
+import selectors
+import shutil
+import signal
+import socket
 import sqlite3
+import statistics
 import subprocess
 import sys
+import tempfile
 import threading
 import time
+import typing as t
+from collections import deque
+from collections.abc import Callable, Iterable
 from concurrent.futures import Future, ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
-from signal import signal
+from dataclasses import asdict, dataclass, field, replace
 
 import requests
+
+import farmer_cache
 from platforms.platform import (
-    BasePlatform,
-    PlatformChallenge,
+    CachedPlatform,
+    CoalescingSession,
     PlatformService,
-    PlatformTeam,
     PlatformUser,
     get_platform,
 )
 from shared import (
+    BASE_DIR,
     BASE_URL,
     DATABASE_PATH,
+    EXPLOIT_CACHE_PATH,
+    EXPLOIT_VERSIONS_PATH,
+    FARMER_ADAPTIVE_CONCURRENCY,
+    FARMER_ADAPTIVE_TIMEOUT,
+    FARMER_ASYNC,
+    FARMER_ASYNC_MAX_CONCURRENCY,
+    FARMER_BATCH,
+    FARMER_BATCH_TIMEOUT,
+    FARMER_BREAKER_COOLDOWN,
+    FARMER_CACHE,
+    FARMER_CACHE_MAX_ENTRIES,
+    FARMER_CACHE_MAX_VALUE,
+    FARMER_CACHE_TTL,
+    FARMER_BREAKER_THRESHOLD,
+    FARMER_CONCURRENCY_MAX,
+    FARMER_CONCURRENCY_MAX_LOAD,
+    FARMER_CONCURRENCY_MAX_TIMEOUT_RATE,
+    FARMER_CONCURRENCY_MIN,
+    FARMER_FORKSERVER,
+    FARMER_MAX_FLAGS,
     FARMER_MAX_WORKERS,
+    FARMER_OUTPUT_HEAD,
+    FARMER_OUTPUT_TAIL,
+    FARMER_PROBE_DEFER,
+    FARMER_PRIORITY,
+    FARMER_PRIORITY_EXPLORE,
+    FARMER_PRIORITY_WINDOW,
+    FARMER_PROBE_TIMEOUT,
+    FARMER_ROUND_BUDGET,
+    FARMER_SEEN_MAX,
+    FARMER_SEEN_TICKS,
+    FARMER_SPILL_MAX_BYTES,
+    FARMER_SPILL_TOTAL_BYTES,
     FARMER_TIMEOUT,
+    FARMER_TIMEOUT_ALPHA,
+    FARMER_TIMEOUT_FLOOR,
+    FARMER_TIMEOUT_MIN_SAMPLES,
+    FARMER_TIMEOUT_PERCENTILE,
+    FARMER_WRITER_BATCH,
+    FARMER_WRITER_FLUSH,
+    FARMER_WRITER_QUEUE,
+    FARMER_TICK_ALIGN,
+    FARMER_TICK_DELAY,
+    FARMER_TICK_INFER,
+    FARMER_TICK_WINDOW_MAX,
+    FARMER_TICK_OFFSET,
     FARMER_WAKE,
     FLAG_PREFIX,
+    INTERVAL,
+    LOGS_PATH,
     PASSWORD,
     PLATFORM,
+    PLATFORM_CACHE_TTL,
+    PLATFORM_COALESCE_TTL,
     SKIP_OUR_TEAM,
     SKIP_OUR_TEAM_IP,
     SKIP_PORT_INPUT,
+    STARTUP_CACHE_MAX_AGE,
+    STARTUP_CACHE_PATH,
     TOKEN,
     USERNAME,
     Flag,
+    FlagNotifier,
     FlagStatus,
+    StartupCache,
     setup_database,
     setup_logging,
 )
 
 filename: str
+exploit_map: dict[int, list[str]] = {}
 
 logger: logging.Logger
 session: requests.Session
-platform: 'BasePlatform'
+platform: 'CachedPlatform'
+
+ChildProcess = subprocess.Popen[bytes] | asyncio.subprocess.Process
 
-child_procs: set[subprocess.Popen[bytes]] = set()
+child_procs: set[ChildProcess] = set()
 child_procs_lock = threading.Lock()
 stop_event = threading.Event()
+forkservers: dict[str, 'ForkServer'] = {}  # by exploit filename
 
-FLAG_REGEX = re.compile(re.escape(FLAG_PREFIX) + r'[A-Za-z0-9_\-+=/\.]{32,128}\}')
+FLAG_REGEX = re.compile(
+    re.escape(FLAG_PREFIX.encode()) + rb'[A-Za-z0-9_\-+=/\.]{32,128}\}'
+)
 
 
-def insert_flag(flag: Flag):
-    try:
-        with sqlite3.connect(DATABASE_PATH, timeout=8) as conn:
-            _ = conn.execute(
-                """
-                INSERT INTO flags (team_id, team_name, challenge_id, challenge_name, flag, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    flag.team_id,
-                    flag.team_name,
-                    flag.challenge_id,
-                    flag.challenge_name,
-                    flag.flag,
-                    flag.status,
-                ),
+class DatabaseWriter:
+    """Single thread that owns the farmer's writes to the database.
+
+    Flags, run log rows and breaker states are queued and written with
+    `executemany`, one transaction per batch. A batch is committed once
+    `FARMER_WRITER_BATCH` rows are waiting or `FARMER_WRITER_FLUSH` seconds
+    after its first row arrived, so exploit threads never wait on SQLite.
+    """
+
+    FLAG_SQL = """
+        INSERT OR IGNORE INTO flags (team_id, team_name, challenge_id, challenge_name, flag, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[tuple[str, tuple[t.Any, ...]] | None] = queue.Queue(
+            maxsize=FARMER_WRITER_QUEUE
+        )
+        self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Write what is still queued and stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=30)
+
+    def add_flag(self, flag: Flag):
+        self.execute(
+            self.FLAG_SQL,
+            (
+                flag.team_id,
+                flag.team_name,
+                flag.challenge_id,
+                flag.challenge_name,
+                flag.flag,
+                flag.status,
+            ),
+        )
+
+    def execute(self, sql: str, params: tuple[t.Any, ...]):
+        self.queue.put((sql, params))
+
+    def run(self):
+        conn = sqlite3.connect(DATABASE_PATH, timeout=8)
+        try:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                if item is None:
+                    break
+
+                batch = [item]
+                flush_at = time.monotonic() + FARMER_WRITER_FLUSH
+                while len(batch) < FARMER_WRITER_BATCH:
+                    try:
+                        item = self.queue.get(
+                            timeout=max(0.0, flush_at - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self.write(conn, batch)
+        finally:
+            conn.close()
+
+    def write(
+        self, conn: sqlite3.Connection, batch: list[tuple[str, tuple[t.Any, ...]]]
+    ):
+        # group consecutive rows of the same statement, keeping their order
+        groups: list[tuple[str, list[tuple[t.Any, ...]]]] = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+
+        flags = [params for sql, params in batch if sql == self.FLAG_SQL]
+
+        for attempt in range(3):
+            try:
+                inserted = 0
+                with conn:
+                    for sql, rows in groups:
+                        cursor = conn.executemany(sql, rows)
+                        if sql == self.FLAG_SQL:
+                            inserted += cursor.rowcount
+                break
+            except sqlite3.Error as e:
+                if attempt < 2:
+                    time.sleep(0.1 * 2**attempt)
+                    continue
+
+                logger.error(f'Error writing {len(batch)} row(s) into database: {e}')
+                for params in flags:
+                    logger.error(f'\tFlag {params[4]} was not stored.')
+                # so the next capture of them is stored instead of skipped
+                seen_flags.forget([params[4] for params in flags])
+                with self.lock:
+                    self.errors += len(flags)
+                return
+
+        with self.lock:
+            self.inserted += inserted
+            self.duplicates += len(flags) - inserted
+
+        if inserted:
+            notifier.notify()
+
+    def report(self):
+        with self.lock:
+            inserted, self.inserted = self.inserted, 0
+            duplicates, self.duplicates = self.duplicates, 0
+            errors, self.errors = self.errors, 0
+
+        if inserted or duplicates or errors:
+            logger.info(
+                f'Database: {inserted} flag(s) inserted, {duplicates} duplicate(s),'
+                f' {errors} error(s), {self.queue.qsize()} row(s) queued.'
+            )
+
+
+db_writer = DatabaseWriter()
+notifier = FlagNotifier()
+startup_cache = StartupCache()
+
+
+class SeenFlags:
+    """Flags captured in the last `FARMER_SEEN_TICKS` ticks.
+
+    Every round finds the current tick's flags again; those repeats are
+    dropped here instead of costing a queued insert and a log line each.
+    Forgetting a flag is harmless, the unique index still rejects it.
+    """
+
+    def __init__(self) -> None:
+        self.flags: dict[str, float] = {}  # flag -> first seen, oldest first
+        self.new = 0
+        self.repeated = 0
+        self.lock = threading.Lock()
+
+    def warm(self):
+        window = f'-{int(FARMER_SEEN_TICKS * INTERVAL)} seconds'
+        try:
+            with sqlite3.connect(DATABASE_PATH, timeout=8) as conn:
+                rows = conn.execute(
+                    """
+                    SELECT flag, CAST(strftime('%s', timestamp) AS REAL)
+                    FROM flags
+                    WHERE timestamp >= datetime('now', ?)
+                    ORDER BY timestamp
+                    """,
+                    (window,),
+                ).fetchall()
+        except Exception as e:
+            logger.error(f'Error loading recent flags from database: {e}')
+            return
+
+        with self.lock:
+            for flag, seen in rows[-FARMER_SEEN_MAX:]:
+                self.flags[flag] = seen
+
+        if rows:
+            logger.info(f'Loaded {len(self.flags)} recent flag(s).')
+
+    def add(self, flag: str) -> bool:
+        """Remember the flag; returns whether it was new."""
+        now = time.time()
+        expired = now - FARMER_SEEN_TICKS * INTERVAL
+
+        with self.lock:
+            while self.flags:
+                oldest, seen = next(iter(self.flags.items()))
+                if seen >= expired and len(self.flags) < FARMER_SEEN_MAX:
+                    break
+                del self.flags[oldest]
+
+            if flag in self.flags:
+                self.repeated += 1
+                return False
+
+            self.flags[flag] = now
+            self.new += 1
+            return True
+
+    def forget(self, flags: list[str]):
+        with self.lock:
+            for flag in flags:
+                _ = self.flags.pop(flag, None)
+
+    def report(self):
+        with self.lock:
+            new, self.new = self.new, 0
+            repeated, self.repeated = self.repeated, 0
+
+        if new or repeated:
+            logger.info(
+                f'Flags: {new} new, {repeated} already captured'
+                f' ({len(self.flags)} remembered).'
             )
-            conn.commit()
 
-        logger.info(f'\tInserted flag {flag.flag} into the database.')
-    except sqlite3.IntegrityError:
-        logger.debug(f'\tFlag {flag.flag} already exists in the database.')
-    except Exception as e:
-        logger.error(f'\tError inserting flag into database: {e}')
 
+seen_flags = SeenFlags()
 
-def register_child(proc: subprocess.Popen[bytes]) -> None:
+
+def register_child(proc: ChildProcess) -> None:
     with child_procs_lock:
         child_procs.add(proc)
 
 
-def unregister_child(proc: subprocess.Popen[bytes]) -> None:
+def unregister_child(proc: ChildProcess) -> None:
     with child_procs_lock:
         child_procs.discard(proc)
 
 
+def is_child_running(proc: ChildProcess) -> bool:
+    if isinstance(proc, subprocess.Popen):
+        return proc.poll() is None
+
+    # asyncio processes get their return code set by the event loop
+    return proc.returncode is None
+
+
 # WHAT THE FUCK? So mANY neSTED TRY CAtCH
-def terminate_child(proc: subprocess.Popen[bytes]):
+def terminate_child(proc: ChildProcess):
     # Try to kill the whole process group (so grandchildren die too).
     try:
-        if proc.poll() is None:
+        if is_child_running(proc):
             try:
                 if os.name == 'nt':
                     # best-effort Windows method
@@ -104,7 +379,7 @@ def terminate_child(proc: subprocess.Popen[bytes]):
                     except Exception:
                         pass
 
-                    if proc.poll() is None:
+                    if is_child_running(proc):
                         proc.kill()
                 else:
                     os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
@@ -130,6 +405,9 @@ def terminate_childs():
     for proc in procs:
         terminate_child(proc)
 
+    for server in list(forkservers.values()):
+        server.kill_children()
+
 
 @dataclass
 class ExploitOutcome:
@@ -137,6 +415,305 @@ class ExploitOutcome:
     err: bytes
     return_code: int
     timeout: bool
+    flags: list[str] = field(default_factory=list)  # already stored while streaming
+    duration: float = 0.0  # wall time, set by the round that ran it
+    cut: bool = False  # killed at the round deadline rather than its own timeout
+
+
+class FlagScanner:
+    """Incremental FLAG_REGEX matcher for output that arrives in chunks.
+
+    The last `OVERLAP - 1` bytes of every chunk are kept, so a flag split
+    across two chunks is still found. Every flag is reported once.
+    """
+
+    OVERLAP = len(FLAG_PREFIX.encode()) + 128 + 1
+
+    def __init__(
+        self,
+        on_flags: Callable[[list[str]], None] | None = None,
+        on_limit: Callable[[], None] | None = None,
+    ) -> None:
+        self.on_flags = on_flags
+        self.on_limit = on_limit
+        self.tail = b''
+        self.flags: list[str] = []
+        self.seen: set[str] = set()
+
+    @property
+    def limit_reached(self) -> bool:
+        return 0 < FARMER_MAX_FLAGS <= len(self.flags)
+
+    def feed(self, chunk: bytes) -> list[str]:
+        data = self.tail + chunk
+        end = 0
+
+        new: list[str] = []
+        for match in FLAG_REGEX.finditer(data):
+            end = match.end()
+            flag = match.group().decode()
+            if flag not in self.seen:
+                self.seen.add(flag)
+                new.append(flag)
+
+        self.tail = data[max(end, len(data) - self.OVERLAP + 1) :]
+
+        if new:
+            limit_reached = self.limit_reached
+            self.flags.extend(new)
+            if self.on_flags:
+                self.on_flags(new)
+            if self.on_limit and self.limit_reached and not limit_reached:
+                self.on_limit()
+
+        return new
+
+
+class SpillDirectory:
+    """logs/spill, kept under FARMER_SPILL_TOTAL_BYTES.
+
+    Opening a spill file deletes the oldest finished ones to make room for
+    it, and writes of all open spill files together never take the
+    directory past the cap: what does not fit is cut off.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.used = 0
+        self.open_paths: set[str] = set()
+        self.lock = threading.Lock()
+
+    def open(self, label: str) -> tuple[str, t.BinaryIO]:
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            self._prune(FARMER_SPILL_TOTAL_BYTES - FARMER_SPILL_MAX_BYTES)
+            fd, path = tempfile.mkstemp(
+                prefix=f'{time.strftime("%Y%m%d-%H%M%S")}-{label}-',
+                suffix='.log',
+                dir=self.path,
+            )
+            self.open_paths.add(path)
+        return path, os.fdopen(fd, 'wb')
+
+    def closed(self, path: str):
+        with self.lock:
+            self.open_paths.discard(path)
+
+    def reserve(self, size: int) -> int:
+        """Bytes of `size` that may still be written."""
+        with self.lock:
+            size = max(0, min(size, FARMER_SPILL_TOTAL_BYTES - self.used))
+            self.used += size
+            return size
+
+    def _prune(self, limit: int):
+        files: list[tuple[float, int, str]] = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+        self.used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self.used <= limit:
+                break
+            if path in self.open_paths:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.used -= size
+
+
+spill_dir = SpillDirectory(os.path.join(LOGS_PATH, 'spill'))
+
+
+class OutputBuffer:
+    """Byte-capped capture of one output stream of an exploit.
+
+    Only the first FARMER_OUTPUT_HEAD and the last FARMER_OUTPUT_TAIL bytes
+    are kept in memory. Once the stream outgrows them, everything is also
+    written to a spill file under logs/spill (up to FARMER_SPILL_MAX_BYTES,
+    see SpillDirectory for the cap on all of them) so it can be inspected
+    later.
+    """
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill: t.BinaryIO | None = None
+        self.spill_path = ''
+        self.spilled = 0
+
+    def write(self, data: bytes):
+        self.total += len(data)
+
+        if len(self.head) < FARMER_OUTPUT_HEAD:
+            room = FARMER_OUTPUT_HEAD - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+
+        if not data:
+            return
+
+        self.tail += data
+        if len(self.tail) <= FARMER_OUTPUT_TAIL:
+            return
+
+        if self.spill is None and not self.spill_path:
+            self._open_spill()
+            self._write_spill(self.head)
+            self._write_spill(self.tail)
+        else:
+            self._write_spill(data)
+
+        del self.tail[: len(self.tail) - FARMER_OUTPUT_TAIL]
+
+    def getvalue(self) -> bytes:
+        omitted = self.total - len(self.head) - len(self.tail)
+        if omitted <= 0:
+            return bytes(self.head + self.tail)
+
+        where = f', full output in {self.spill_path}' if self.spill_path else ''
+        marker = f'\n... [{omitted} bytes omitted{where}] ...\n'.encode()
+        return bytes(self.head) + marker + bytes(self.tail)
+
+    def close(self):
+        if self.spill:
+            self.spill.close()
+            self.spill = None
+            spill_dir.closed(self.spill_path)
+
+    def _open_spill(self):
+        if FARMER_SPILL_MAX_BYTES <= 0:
+            self.spill_path = '-'  # spilling disabled, don't try again
+            return
+
+        try:
+            self.spill_path, self.spill = spill_dir.open(self.label)
+        except OSError as e:
+            logger.error(f'Cannot spill output of {self.label}: {e}')
+            self.spill_path = '-'
+            return
+
+        logger.warning(
+            f'Output of {self.label} exceeded {FARMER_OUTPUT_HEAD + FARMER_OUTPUT_TAIL} bytes, spilling to {self.spill_path}'
+        )
+
+    def _write_spill(self, data: bytes | bytearray):
+        if self.spill is None:
+            return
+
+        wanted = min(len(data), FARMER_SPILL_MAX_BYTES - self.spilled)
+        allowed = spill_dir.reserve(wanted)
+        _ = self.spill.write(data[:allowed])
+        self.spilled += allowed
+        # full, or the spill directory is out of room
+        if self.spilled >= FARMER_SPILL_MAX_BYTES or allowed < wanted:
+            self.close()
+
+
+def read_pipes(
+    out_fd: int,
+    err_fd: int,
+    deadline: float,
+    out: OutputBuffer,
+    err: OutputBuffer,
+    on_out: Callable[[bytes], None] | None = None,
+) -> bool:
+    """Read both pipes into their buffers until EOF or the monotonic `deadline`.
+
+    `on_out` sees every stdout chunk, uncapped, as soon as it is read.
+    Returns whether the deadline passed first.
+    """
+    buffers = {out_fd: out, err_fd: err}
+
+    if os.name == 'nt':
+        # select() does not work on pipes on Windows, use a reader per pipe
+        def reader(fd: int):
+            while data := os.read(fd, 65536):
+                buffers[fd].write(data)
+                if on_out and fd == out_fd:
+                    on_out(data)
+
+        threads = [
+            threading.Thread(target=reader, args=(fd,), daemon=True) for fd in buffers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+        return any(thread.is_alive() for thread in threads)
+
+    with selectors.DefaultSelector() as sel:
+        for fd in buffers:
+            _ = sel.register(fd, selectors.EVENT_READ)
+
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+
+            for key, _ in sel.select(remaining):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    _ = sel.unregister(key.fd)
+                    continue
+                buffers[key.fd].write(data)
+
+                if on_out and key.fd == out_fd:
+                    on_out(data)
+
+    return False
+
+
+def cache_scope(target: 'ServiceDetails') -> str:
+    challenge_id, team_id = target_key(target)
+    return f'{challenge_id}:{team_id}'
+
+
+def exploit_env(target: 'ServiceDetails | None' = None) -> dict[str, str]:
+    """Environment exploits run with, see farmer_cache.py.
+
+    BASE_DIR goes on PYTHONPATH so `import farmer_cache` works wherever the
+    exploit lives. Without a target (fork server, batch) only the shared part
+    is returned.
+    """
+    env = {
+        'PYTHONPATH': os.pathsep.join(
+            filter(None, [BASE_DIR, os.environ.get('PYTHONPATH')])
+        )
+    }
+    if not FARMER_CACHE:
+        return env
+
+    env.update(
+        FARMER_CACHE=EXPLOIT_CACHE_PATH,
+        FARMER_CACHE_TTL=str(FARMER_CACHE_TTL),
+        FARMER_CACHE_MAX_VALUE=str(FARMER_CACHE_MAX_VALUE),
+        FARMER_CACHE_MAX_ENTRIES=str(FARMER_CACHE_MAX_ENTRIES),
+    )
+    if target:
+        env['FARMER_CACHE_SCOPE'] = cache_scope(target)
+    return env
+
+
+def prune_exploit_cache():
+    try:
+        deleted = farmer_cache.prune(EXPLOIT_CACHE_PATH, FARMER_CACHE_MAX_ENTRIES)
+    except sqlite3.Error as e:
+        logger.warning(f'Could not prune the exploit cache: {e}')
+        return
+
+    if deleted:
+        logger.info(f'Exploit cache: {deleted} stale entries dropped')
 
 
 # FIXME: Bad retry concept, because what if the error is different each
@@ -144,14 +721,21 @@ class ExploitOutcome:
 # TODO: Refactor this to make it more readable. Or maybe not just refactor
 #   this function, but the whole file.
 def run_exploit(
-    ip: str, port: int, filename: str, retries: int = 1, backoff: float = 2
+    ip: str,
+    port: int,
+    filename: str,
+    retries: int = 1,
+    backoff: float = 2,
+    on_flags: Callable[[list[str]], None] | None = None,
+    timeout: float = FARMER_TIMEOUT,
+    env: dict[str, str] | None = None,
 ) -> ExploitOutcome:
-    cwd = os.path.dirname(os.path.abspath(filename)) or None
-    file = os.path.basename(filename)
+    cwd, file, full_env = exploit_process(filename, env)
 
     for attempt in range(1, retries + 1):
         proc = None
-        out, err = b'', b''
+        out = OutputBuffer(f'{ip}_{port}.out')
+        err = OutputBuffer(f'{ip}_{port}.err')
 
         try:
             if os.name == 'nt':
@@ -160,6 +744,7 @@ def run_exploit(
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     cwd=cwd,
+                    env=full_env,
                     creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
                 )
             else:
@@ -168,29 +753,59 @@ def run_exploit(
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     cwd=cwd,
+                    env=full_env,
                     preexec_fn=os.setsid,
                 )
 
             register_child(proc)
 
-            try:
-                out, err = proc.communicate(timeout=FARMER_TIMEOUT)
-            except KeyboardInterrupt:
-                print('Exploit interrupted by user, cancelling...')
-            except subprocess.TimeoutExpired:
-                terminate_child(proc)
+            # Flags are stored the moment they are printed; the child is
+            # killed once it has given us FARMER_MAX_FLAGS of them.
+            scanner = FlagScanner(on_flags, lambda: terminate_child(proc))
+
+            assert proc.stdout is not None and proc.stderr is not None
+            deadline = time.monotonic() + timeout
+            timed_out = read_pipes(
+                proc.stdout.fileno(),
+                proc.stderr.fileno(),
+                deadline,
+                out,
+                err,
+                scanner.feed,
+            )
 
-                # attempt to collect any remaining output
+            rc = -1
+            if not timed_out:
                 try:
-                    out, err = proc.communicate(timeout=5)
-                except Exception:
-                    out, err = out or b'', err or b''
+                    rc = proc.wait(timeout=max(0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+
+            if timed_out:
+                terminate_child(proc)
 
-                return ExploitOutcome(out, err, -1, True)
+                # attempt to collect any remaining output
+                _ = read_pipes(
+                    proc.stdout.fileno(),
+                    proc.stderr.fileno(),
+                    time.monotonic() + 5,
+                    out,
+                    err,
+                    scanner.feed,
+                )
+                return ExploitOutcome(
+                    out.getvalue(), err.getvalue(), -1, True, scanner.flags
+                )
 
-            rc = proc.returncode
+            if scanner.limit_reached:
+                rc = 0  # we stopped it, not a failure
 
-            if attempt < retries and not stop_event.is_set() and rc != 0:
+            if (
+                attempt < retries
+                and not stop_event.is_set()
+                and rc != 0
+                and not scanner.flags
+            ):
                 unregister_child(proc)
                 _ = stop_event.wait(backoff)
                 backoff = min(
@@ -198,7 +813,9 @@ def run_exploit(
                 )  # Exponential backoff with jitter
                 continue
 
-            return ExploitOutcome(out, err, rc, False)
+            return ExploitOutcome(
+                out.getvalue(), err.getvalue(), rc, False, scanner.flags
+            )
         except Exception as e:
             return ExploitOutcome(
                 b'',
@@ -207,283 +824,2155 @@ def run_exploit(
                 False,
             )
         finally:
+            out.close()
+            err.close()
             if proc:
                 unregister_child(proc)
+                for pipe in (proc.stdout, proc.stderr):
+                    if pipe:
+                        pipe.close()
 
     # This will never happen
     return ExploitOutcome(b'', b'Unknown error', -1, False)
 
 
-@dataclass
-class ServiceDetails:
-    ip: str
-    port: int
-    team_id: int
-    team_name: str
-    challenge_id: int
-    challenge_name: str
+class ForkServer:
+    """Client for forkserver.py, which forks warm copies of the exploit."""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.proc: subprocess.Popen[bytes] | None = None
+        self.tmpdir = ''
+        self.socket_path = ''
+        self.pids: set[int] = set()  # exploit runs in flight
+        self.lock = threading.Lock()
+
+    def start(self):
+        cwd, file, env = exploit_process(self.filename, exploit_env())
+        self.tmpdir = tempfile.mkdtemp(prefix='forkserver-')
+        self.socket_path = os.path.join(self.tmpdir, 'forkserver.sock')
+
+        self.proc = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(BASE_DIR, 'forkserver.py'),
+                self.socket_path,
+                file,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            start_new_session=True,
+        )
+        # Not a child_procs entry: terminate_childs must only kill the runs
+        # (see kill_children), the server outlives the round.
 
+        assert self.proc.stdout is not None
+        if self.proc.stdout.readline().strip() != b'ready':
+            self.stop()
+            raise RuntimeError('fork server failed to start')
 
-def exploit_services(
-    ex: ThreadPoolExecutor,
-    teams: list[PlatformTeam] | None,
-    challenges: list[PlatformChallenge] | None,
-    services: list[PlatformService],
-    filename: str,
-):
-    futures: dict[Future[ExploitOutcome], ServiceDetails] = {}
-    for service in services:
-        try:
-            ip, port_str = service.addresses[0].rsplit(':', 1)
-            ip = ip.strip()
-            port = int(port_str)
-        except (ValueError, AttributeError):
-            raise ValueError(f'Invalid address format: {service.addresses[0]!r}')
+    def stop(self):
+        if self.proc:
+            terminate_child(self.proc)
+            try:
+                _ = self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+            self.proc = None
 
-        team_name = 'Unknown Team'
-        if teams:
-            team_name = next(
-                (team.name for team in teams if team.id == service.team_id),
-                'Unknown Team',
-            )
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
 
-        challenge_name = 'Unknown Challenge'
-        if challenges:
-            challenge_name = next(
-                (
-                    challenge.title
-                    for challenge in challenges
-                    if challenge.id == service.challenge_id or challenge.port == port
-                ),
-                'Unknown Challenge',
-            )
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
 
-        service_detail = ServiceDetails(
-            ip=ip,
-            port=port,
-            team_id=service.team_id or -1,
-            team_name=team_name,
-            challenge_id=service.challenge_id or -1,
-            challenge_name=challenge_name,
-        )
+    def kill_children(self):
+        with self.lock:
+            pids = list(self.pids)
 
-        if SKIP_OUR_TEAM:
-            if PLATFORM in ['ailurus']:
-                try:
-                    me: PlatformUser = platform.get_me()
-                    if service_detail.team_id == me.team_id:
-                        continue
-                except Exception as e:
-                    logger.error(f'Error fetching own team ID: {e}')
-                    continue
-            elif PLATFORM in ['gemastik25']:
-                try:
-                    me: PlatformUser = platform.get_me()
-                    if service_detail.team_name.strip() == me.team_name.strip():
-                        continue
-                except Exception as e:
-                    logger.error(f'Error fetching own team name: {e}')
-                    continue
-            else:
-                if SKIP_OUR_TEAM_IP in service_detail.ip:
-                    continue
+        for pid in pids:
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def run(
+        self,
+        ip: str,
+        port: int,
+        timeout: float,
+        on_flags: Callable[[list[str]], None] | None = None,
+        env: dict[str, str] | None = None,
+    ) -> ExploitOutcome:
+        deadline = time.monotonic() + timeout
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        out = OutputBuffer(f'{ip}_{port}.out')
+        err = OutputBuffer(f'{ip}_{port}.err')
+        pid = 0
 
-        logger.info(
-            f'Running exploit against {service_detail.team_name} ({service_detail.team_id}) ({ip}:{port})'
-        )
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                # a wedged server must not hold the worker past the deadline
+                conn.settimeout(max(0.1, deadline - time.monotonic()))
+                conn.connect(self.socket_path)
+                request = {
+                    'argv': [os.path.abspath(self.filename), ip, str(port)],
+                    'env': env or {},
+                }
+                _ = socket.send_fds(
+                    conn, [json.dumps(request).encode()], [out_w, err_w]
+                )
+                os.close(out_w)
+                os.close(err_w)
+                out_w = err_w = -1
 
-        fut = ex.submit(run_exploit, ip, port, filename)
-        futures[fut] = service_detail
+                reader = conn.makefile('rb')
+                try:
+                    pid = int(json.loads(reader.readline())['pid'])
+                except socket.timeout:
+                    return ExploitOutcome(
+                        b'', b'Fork server did not answer in time', -1, True
+                    )
+                with self.lock:
+                    self.pids.add(pid)
 
-    for future in as_completed(futures):
-        service_detail = futures[future]
+                def kill():
+                    try:
+                        os.killpg(pid, signal.SIGTERM)
+                    except OSError:
+                        pass
 
-        logger.info(
-            f'Exploit result from {service_detail.team_name} ({service_detail.team_id}) ({service_detail.ip}:{service_detail.port}):'
-        )
+                scanner = FlagScanner(on_flags, kill)
 
-        result = future.result()
-        if result.timeout:
-            logger.error(f'\tExploit timed out after {FARMER_TIMEOUT} seconds.')
-            continue
+                timed_out = read_pipes(out_r, err_r, deadline, out, err, scanner.feed)
+                if timed_out:
+                    kill()
 
-        if result.return_code != 0:
-            if result.out:
-                logger.debug('\tstdout:')
-                for line in result.out.decode().splitlines():
-                    logger.debug(f'\t\t{line}')
+                    # attempt to collect any remaining output
+                    _ = read_pipes(
+                        out_r, err_r, time.monotonic() + 5, out, err, scanner.feed
+                    )
+                    return ExploitOutcome(
+                        out.getvalue(), err.getvalue(), -1, True, scanner.flags
+                    )
 
-            if result.err:
-                logger.error('\tstderr:')
-                for line in result.err.decode().splitlines():
-                    logger.error(f'\t\t{line}')
+                conn.settimeout(max(0.1, deadline - time.monotonic()))
+                rc: int = json.loads(reader.readline())['rc']
+                if scanner.limit_reached:
+                    rc = 0  # we stopped it, not a failure
 
-            logger.info(f'\tReturn code: {result.return_code}')
-            continue
+                return ExploitOutcome(
+                    out.getvalue(), err.getvalue(), rc, False, scanner.flags
+                )
+        finally:
+            with self.lock:
+                self.pids.discard(pid)
+            out.close()
+            err.close()
+            for fd in (out_r, out_w, err_r, err_w):
+                if fd != -1:
+                    os.close(fd)
+
+
+def run_exploit_forked(
+    server: ForkServer,
+    ip: str,
+    port: int,
+    retries: int = 1,
+    backoff: float = 2,
+    on_flags: Callable[[list[str]], None] | None = None,
+    timeout: float = FARMER_TIMEOUT,
+    env: dict[str, str] | None = None,
+) -> ExploitOutcome:
+    for attempt in range(1, retries + 1):
+        try:
+            result = server.run(ip, port, timeout, on_flags, env)
+        except Exception as e:
+            return ExploitOutcome(
+                b'',
+                f'Error running exploit: {e}'.encode(),
+                -1,
+                False,
+            )
 
-        flags = FLAG_REGEX.findall(result.out.decode())
-        if not flags:
-            logger.warning('\tNo flag found.')
+        if (
+            attempt < retries
+            and not stop_event.is_set()
+            and not result.timeout
+            and result.return_code != 0
+            and not result.flags
+        ):
+            _ = stop_event.wait(backoff)
+            backoff = min(
+                backoff * 2 + random.uniform(0, 1), 30
+            )  # Exponential backoff with jitter
             continue
 
-        flags: list[str] = list(set(flags))
-        logger.info(f'\tFound {len(flags)} unique flag(s).')
-
-        for flag in flags:
-            logger.info(f'\tFound flag: {flag}')
-            insert_flag(
-                Flag(
-                    team_id=service_detail.team_id,
-                    team_name=service_detail.team_name,
-                    challenge_id=service_detail.challenge_id,
-                    challenge_name=service_detail.challenge_name,
-                    flag=flag,
-                    status=FlagStatus.UNKNOWN,
-                ),
-            )
+        return result
 
+    # This will never happen
+    return ExploitOutcome(b'', b'Unknown error', -1, False)
 
-def main():
-    try:
-        _ = platform.login()
-        logger.info(f'Logged in, token: {platform.token}')
-    except requests.HTTPError as e:
-        logger.critical(f'Failed to log in: {e}')
-        sys.exit(1)
-
-    # i hate this..
-    challenge_id = -1
-    port = -1
 
-    teams = None
-    challenges = None
+async def run_exploit_async(
+    ip: str,
+    port: int,
+    filename: str,
+    retries: int = 1,
+    backoff: float = 2,
+    on_flags: Callable[[list[str]], None] | None = None,
+    timeout: float = FARMER_TIMEOUT,
+    env: dict[str, str] | None = None,
+) -> ExploitOutcome:
+    """Same contract as `run_exploit`, but driven by the event loop."""
+    cwd, file, full_env = exploit_process(filename, env)
 
-    try:
-        teams = list(platform.list_teams())
-        if teams:
-            logger.info(f'Found {len(teams)} teams.')
-            for team in teams:
-                logger.info(f'\tTeam {team.id}: {team.name}')
-    except requests.RequestException as e:
-        logger.error(f'Network error fetching teams: {e}')
-    except ValueError as e:
-        logger.error(f'Error fetching teams: {e}')
+    for attempt in range(1, retries + 1):
+        proc = None
+        out = OutputBuffer(f'{ip}_{port}.out')
+        err = OutputBuffer(f'{ip}_{port}.err')
 
-    if PLATFORM in ['ailurus', 'gemastik25']:
         try:
-            challenges = list(platform.list_challenges())
-            if challenges:
-                logger.info(f'Found {len(challenges)} challenges.')
-                for challenge in challenges:
-                    logger.info(f'\tChallenge {challenge.id}: {challenge.title}')
-
-            if PLATFORM in ['ailurus'] or (
-                PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT
-            ):
-                challenge_id = int(input('Enter challenge ID to target: ').strip())
-
-                if PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT:
-                    selected_challenge = next(
-                        (c for c in challenges if c.id == challenge_id), None
-                    )
-                    if selected_challenge is None:
-                        logger.error(f'Challenge ID {challenge_id} not found.')
-                        sys.exit(1)
+            if os.name == 'nt':
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable,
+                    file,
+                    ip,
+                    str(port),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=cwd,
+                    env=full_env,
+                    creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+                )
+            else:
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable,
+                    file,
+                    ip,
+                    str(port),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=cwd,
+                    env=full_env,
+                    start_new_session=True,
+                )
 
-                    port = selected_challenge.port
-                    logger.info(
-                        f'Selected challenge {selected_challenge.title} with port {port}.'
-                    )
-        except requests.RequestException as e:
-            logger.error(f'Network error fetching challenges: {e}')
-            sys.exit(1)
-        except ValueError as e:
-            logger.error(f'Error fetching challenges: {e}')
-            sys.exit(1)
+            register_child(proc)
 
-    if not challenges and not SKIP_PORT_INPUT:
-        port = int(input('Enter service port to target: ').strip())
+            # Read both pipes ourselves instead of communicate(), so the
+            # output gathered so far survives a timeout and stdout can be
+            # scanned for flags while the exploit is still running.
+            assert proc.stdout is not None and proc.stderr is not None
+            scanner = FlagScanner(on_flags, lambda: terminate_child(proc))
 
-    while True:
-        # also hate this stupid code
-        try:
-            services = list(
-                platform.get_services(
-                    {
-                        'challenge_id': challenge_id,
-                    }
-                    if challenge_id != -1
-                    else {}
-                )
+            async def read_stream(
+                stream: asyncio.StreamReader,
+                buffer: OutputBuffer,
+                on_chunk: Callable[[bytes], object] | None = None,
+            ):
+                while chunk := await stream.read(65536):
+                    buffer.write(chunk)
+                    if on_chunk:
+                        _ = on_chunk(chunk)
+
+            pending = asyncio.gather(
+                read_stream(proc.stdout, out, scanner.feed),
+                read_stream(proc.stderr, err),
+                proc.wait(),
             )
-        except requests.RequestException as e:
-            logger.error(f'Network error fetching services: {e}')
-            _ = stop_event.wait(FARMER_WAKE)
-            continue
-        except ValueError as e:
-            logger.error(f'Error fetching services: {e}')
-            _ = stop_event.wait(FARMER_WAKE)
-            continue
 
-        if not services:
-            logger.warning('No services found, retrying after sleep...')
-            _ = stop_event.wait(FARMER_WAKE)
-            continue
+            try:
+                _, _, rc = await asyncio.wait_for(asyncio.shield(pending), timeout)
+            except asyncio.TimeoutError:
+                terminate_child(proc)
 
-        # what the fuck is this?
-        if challenge_id == -1 or (PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT):
-            for service in services:
-                try:
-                    ip_str = service.addresses[0].rsplit(':', 1)[0]
-                except (ValueError, AttributeError, IndexError):
-                    # If the address is malformed or missing, skip modifying this service
-                    continue
-                # Assign to the attribute rather than using item assignment on the object
+                # attempt to collect any remaining output
                 try:
-                    setattr(service, 'addresses', [f'{ip_str}:{port}'])
+                    _ = await asyncio.wait_for(pending, 5)
                 except Exception:
-                    # Best-effort: if we can't set the attribute, skip modifying this service
-                    continue
+                    pass
 
-        with ThreadPoolExecutor(max_workers=FARMER_MAX_WORKERS) as ex:
-            try:
-                exploit_services(ex, teams, challenges, services, filename)
-            except KeyboardInterrupt:
-                logger.info(
-                    'Exploitation interrupted by user, cancelling pending exploits...'
+                return ExploitOutcome(
+                    out.getvalue(), err.getvalue(), -1, True, scanner.flags
                 )
-                stop_event.set()
-                terminate_childs()
-                ex.shutdown(wait=False, cancel_futures=True)
+            except asyncio.CancelledError:
+                terminate_child(proc)
+                raise
+
+            if scanner.limit_reached:
+                rc = 0  # we stopped it, not a failure
+
+            if (
+                attempt < retries
+                and not stop_event.is_set()
+                and rc != 0
+                and not scanner.flags
+            ):
+                unregister_child(proc)
+                await asyncio.sleep(backoff)
+                backoff = min(
+                    backoff * 2 + random.uniform(0, 1), 30
+                )  # Exponential backoff with jitter
+                continue
+
+            return ExploitOutcome(
+                out.getvalue(), err.getvalue(), rc, False, scanner.flags
+            )
+        except Exception as e:
+            return ExploitOutcome(
+                b'',
+                f'Error running exploit: {e}'.encode(),
+                -1,
+                False,
+            )
+        finally:
+            out.close()
+            err.close()
+            if proc:
+                unregister_child(proc)
+
+    # This will never happen
+    return ExploitOutcome(b'', b'Unknown error', -1, False)
+
+
+def install_child_watcher():
+    # Before 3.12 asyncio waits on every child from a dedicated thread. A
+    # pidfd watcher keeps hundreds of exploit children on the loop thread.
+    if os.name == 'nt' or sys.version_info >= (3, 12):
+        return
+
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError):
+        return
+
+    asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+
+
+@dataclass
+class ServiceDetails:
+    ip: str
+    port: int
+    team_id: int
+    team_name: str
+    challenge_id: int
+    challenge_name: str
+
+
+def target_key(target: ServiceDetails) -> tuple[int, int]:
+    """(challenge, team) the per-target state is kept under.
+
+    Platforms without challenges give every service challenge id -1, so the
+    negated port stands in for it there. It is also what breaker and run
+    log rows store as their challenge_id.
+    """
+    if target.challenge_id == -1:
+        return (-target.port, target.team_id)
+    return (target.challenge_id, target.team_id)
+
+
+@dataclass
+class ExploitSpec:
+    """A challenge (or a bare port) and the exploits to run against it."""
+
+    challenge_id: int
+    port: int
+    rewrite_port: bool
+    filenames: list[str]
+
+
+@dataclass
+class ExploitJob:
+    target: ServiceDetails
+    filename: str  # as given on the command line
+    version: str = ''
+    path: str = ''  # snapshot of that version, what actually runs
+
+    @property
+    def exploit(self) -> str:
+        name = os.path.basename(self.filename)
+        return f'{name}@{self.version}' if self.version else name
+
+
+@dataclass
+class ExploitVersion:
+    version: str  # short hash of the source
+    path: str
+    stat: tuple[int, int]  # mtime and size of the source it was taken from
+
+
+class ExploitFiles:
+    """The exploits the farmer runs, reloaded when their files change.
+
+    A changed file is compiled before it is taken. Each version is copied
+    under this farmer's directory in EXPLOIT_VERSIONS_PATH, keeping its file
+    name, so a half-saved file never runs; `exploit_process` runs it from
+    the original's directory. Changes are picked up when a round is planned,
+    so in-flight runs finish on the version they started with. With the
+    fork server, it is restarted for the new version.
+    """
+
+    def __init__(self) -> None:
+        self.directory = os.path.join(EXPLOIT_VERSIONS_PATH, str(os.getpid()))
+        self.origins: dict[str, str] = {}  # version copy -> exploit
+        self.versions: dict[str, ExploitVersion] = {}
+        self.broken: dict[str, tuple[int, int]] = {}  # sources that failed to compile
+        self.forkserver = False
+        self.stats: dict[str, list[float]] = {}  # exploit -> runs, hits, flags, time
+        self.lock = threading.Lock()
+
+    def expand(self, sources: list[str]) -> list[str]:
+        """Exploit files of the given files and directories."""
+        files: list[str] = []
+        for source in sources:
+            if not os.path.isdir(source):
+                files.append(source)
+                continue
+
+            files.extend(
+                os.path.join(source, name)
+                for name in sorted(os.listdir(source))
+                if name.endswith('.py') and not name.startswith(('.', '_'))
+            )
+        return files
+
+    def current(self, filename: str) -> ExploitVersion | None:
+        """Version of the file to run, taking a new one if it changed."""
+        version = self._current(filename)
+        if version and self.forkserver:
+            server = forkservers.get(filename)
+            if server is None or not server.alive():
+                self.restart_forkserver(filename, version)
+        return version
+
+    def _current(self, filename: str) -> ExploitVersion | None:
+        known = self.versions.get(filename)
+        try:
+            st = os.stat(filename)
+        except OSError as e:
+            if filename not in self.broken:
+                logger.error(f'Cannot read exploit {filename}: {e}')
+                self.broken[filename] = (0, 0)
+            return known
+
+        stat = (st.st_mtime_ns, st.st_size)
+        if (known and known.stat == stat) or self.broken.get(filename) == stat:
+            return known
+
+        try:
+            with open(filename, 'rb') as f:
+                source = f.read()
+        except OSError as e:
+            # replaced or removed since the stat, e.g. by an atomic save
+            logger.error(f'Cannot read exploit {filename}: {e}')
+            return known
+
+        version = hashlib.sha1(source).hexdigest()[:8]
+        if known and known.version == version:
+            known.stat = stat
+            return known
+
+        try:
+            _ = compile(source, filename, 'exec')
+        except (SyntaxError, ValueError) as e:
+            self.broken[filename] = stat
+            logger.error(
+                f'Exploit {filename} does not compile, '
+                f'{"keeping version " + known.version if known else "not running it"}: {e}'
+            )
+            return known
+
+        self.broken.pop(filename, None)
+        origin = os.path.abspath(filename)
+        directory = os.path.join(
+            self.directory,
+            f'{hashlib.sha1(origin.encode()).hexdigest()[:8]}.{version}',
+        )
+        path = os.path.join(directory, os.path.basename(origin))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(f'{path}.tmp', 'wb') as f:
+                _ = f.write(source)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.error(f'Cannot copy exploit {filename}: {e}')
+            return known
+
+        new = ExploitVersion(version, path, stat)
+        self.versions[filename] = new
+        self.origins[path] = filename
+        if known:
+            logger.info(f'Reloaded exploit {filename}: {known.version} -> {version}')
+        else:
+            logger.info(f'Loaded exploit {filename} version {version}')
+
+        if self.forkserver:
+            self.restart_forkserver(filename, new)
+        if known:
+            self.remove(known.path)
+
+        return new
+
+    def restart_forkserver(self, filename: str, exploit: ExploitVersion):
+        old = forkservers.pop(filename, None)
+        if old:
+            old.stop()
+
+        server = ForkServer(exploit.path)
+        try:
+            server.start()
+        except (OSError, RuntimeError) as e:
+            logger.error(f'Fork server for {filename} failed, using Popen: {e}')
+            return
+
+        forkservers[filename] = server
+        logger.info(f'Fork server started for {filename} version {exploit.version}.')
+
+    def observe(self, job: ExploitJob, result: ExploitOutcome):
+        with self.lock:
+            stats = self.stats.setdefault(job.exploit, [0, 0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += bool(result.flags)
+            stats[2] += len(result.flags)
+            stats[3] += result.duration
+
+    def report(self):
+        """Log this round's yield and runtime per exploit version."""
+        with self.lock:
+            stats, self.stats = self.stats, {}
+
+        for exploit, (runs, hits, flags, duration) in sorted(stats.items()):
+            logger.info(
+                f'Exploit {exploit}: {hits}/{runs:.0f} run(s) with flags,'
+                f' {flags:.0f} flag(s), mean runtime {duration / runs:.1f}s'
+            )
+
+    def remove(self, path: str):
+        self.origins.pop(path, None)
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def clean(self):
+        """Drop the copies of farmers that are gone, killed or crashed."""
+        if os.name == 'nt':
+            return  # os.kill would terminate the process, not probe it
+
+        try:
+            entries = os.listdir(EXPLOIT_VERSIONS_PATH)
+        except OSError:
+            return
+
+        for entry in entries:
+            try:
+                os.kill(int(entry), 0)
+                continue
+            except (ValueError, ProcessLookupError):
+                pass
+            except OSError:
+                continue  # alive, but not ours to signal
+            shutil.rmtree(
+                os.path.join(EXPLOIT_VERSIONS_PATH, entry), ignore_errors=True
+            )
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def exploit_process(
+    path: str, env: dict[str, str] | None
+) -> tuple[str | None, str, dict[str, str]]:
+    """Working directory, script and environment to run an exploit with.
+
+    A version copy runs from the directory of the exploit it was taken from,
+    which also goes on PYTHONPATH so the exploit's own modules still import.
+    """
+    directory = os.path.dirname(os.path.abspath(exploits.origins.get(path, path)))
+    env = {**os.environ, **(env or {})}
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [directory, env.get('PYTHONPATH')])
+    )
+    return directory or None, os.path.abspath(path), env
+
+
+exploits = ExploitFiles()
+
+
+def build_targets(services: list[PlatformService]) -> list[ServiceDetails]:
+    me: PlatformUser | None = None
+    if SKIP_OUR_TEAM and PLATFORM in ['ailurus', 'gemastik25']:
+        try:
+            me = platform.get_me()
+        except Exception as e:
+            logger.error(f'Error fetching own team: {e}')
+            return []
+
+    targets: list[ServiceDetails] = []
+    for service in services:
+        try:
+            ip, port_str = service.addresses[0].rsplit(':', 1)
+            ip = ip.strip()
+            port = int(port_str)
+        except (ValueError, AttributeError):
+            raise ValueError(f'Invalid address format: {service.addresses[0]!r}')
+
+        team = platform.teams_by_id.get(service.team_id or -1)
+        challenge = platform.challenges_by_id.get(
+            service.challenge_id or -1
+        ) or platform.challenges_by_port.get(port)
+
+        service_detail = ServiceDetails(
+            ip=ip,
+            port=port,
+            team_id=service.team_id or -1,
+            team_name=team.name if team else 'Unknown Team',
+            challenge_id=service.challenge_id or -1,
+            challenge_name=challenge.title if challenge else 'Unknown Challenge',
+        )
+
+        if me and PLATFORM in ['ailurus']:
+            if service_detail.team_id == me.team_id:
+                continue
+        elif me and PLATFORM in ['gemastik25']:
+            if service_detail.team_name.strip() == (me.team_name or '').strip():
+                continue
+        elif SKIP_OUR_TEAM and SKIP_OUR_TEAM_IP in service_detail.ip:
+            continue
+
+        targets.append(service_detail)
+
+    return targets
+
+
+class BreakerState(str, enum.Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+@dataclass
+class Breaker:
+    state: str = BreakerState.CLOSED
+    failures: int = 0  # consecutive runs without a flag
+    skipped: int = 0  # rounds skipped since the breaker opened
+    reason: str = ''
+
+
+class CircuitBreakers:
+    """Per-(challenge, team) circuit breakers, persisted in the database.
+
+    After FARMER_BREAKER_THRESHOLD consecutive runs without a flag a target
+    is skipped. Every FARMER_BREAKER_COOLDOWN rounds it gets one trial run
+    (half-open); a flag closes the breaker again, anything else reopens it.
+    A new version of an exploit half-opens its challenge's breakers at once.
+    """
+
+    def __init__(self) -> None:
+        self.breakers: dict[tuple[int, int], Breaker] = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        with sqlite3.connect(DATABASE_PATH, timeout=8) as conn:
+            rows = conn.execute(
+                'SELECT challenge_id, team_id, state, failures, skipped, reason FROM circuit_breakers'
+            ).fetchall()
+
+        with self.lock:
+            for challenge_id, team_id, state, failures, skipped, reason in rows:
+                self.breakers[(challenge_id, team_id)] = Breaker(
+                    state, failures, skipped, reason
+                )
+
+        opened = sum(
+            1 for b in self.breakers.values() if b.state != BreakerState.CLOSED
+        )
+        if opened:
+            logger.info(f'Loaded {opened} open circuit breaker(s).')
+
+    def allow(self, target: ServiceDetails) -> str | None:
+        """Count a round for the target; returns why it is skipped, if it is."""
+        if FARMER_BREAKER_THRESHOLD <= 0:
+            return None
+
+        key = target_key(target)
+        with self.lock:
+            breaker = self.breakers.get(key)
+            if breaker is None or breaker.state == BreakerState.CLOSED:
+                return None
+
+            if breaker.state == BreakerState.OPEN:
+                breaker.skipped += 1
+                if breaker.skipped <= FARMER_BREAKER_COOLDOWN:
+                    self._save(key, breaker)
+                    return (
+                        f'open after {breaker.failures} failures ({breaker.reason}),'
+                        f' trial in {FARMER_BREAKER_COOLDOWN - breaker.skipped + 1} round(s)'
+                    )
+
+                breaker.state = BreakerState.HALF_OPEN
+                self._save(key, breaker)
+
+        logger.info(
+            f'Breaker: trial run against {target.team_name} ({target.team_id}) ({target.ip}:{target.port})'
+        )
+        return None
+
+    def record(self, target: ServiceDetails, success: bool, reason: str = ''):
+        if FARMER_BREAKER_THRESHOLD <= 0:
+            return
+
+        key = target_key(target)
+        with self.lock:
+            breaker = self.breakers.setdefault(key, Breaker())
+            if success:
+                if breaker.state != BreakerState.CLOSED or breaker.failures:
+                    if breaker.state != BreakerState.CLOSED:
+                        logger.info(
+                            f'Breaker: {target.team_name} ({target.team_id}) closed again'
+                        )
+                    breaker.state = BreakerState.CLOSED
+                    breaker.failures = 0
+                    breaker.skipped = 0
+                    breaker.reason = ''
+                    self._save(key, breaker)
+                return
+
+            breaker.failures += 1
+            breaker.reason = reason
+            if (
+                breaker.state == BreakerState.HALF_OPEN
+                or breaker.failures >= FARMER_BREAKER_THRESHOLD
+            ):
+                if breaker.state != BreakerState.OPEN:
+                    logger.warning(
+                        f'Breaker: {target.team_name} ({target.team_id}) opened after {breaker.failures} failures ({reason})'
+                    )
+                breaker.state = BreakerState.OPEN
+                breaker.skipped = 0
+            self._save(key, breaker)
+
+    def half_open(self, keys: Iterable[tuple[int, int]]) -> int:
+        """Give the open breakers of these targets a trial run next round."""
+        count = 0
+        with self.lock:
+            for key in keys:
+                breaker = self.breakers.get(key)
+                if breaker is None or breaker.state != BreakerState.OPEN:
+                    continue
+                breaker.state = BreakerState.HALF_OPEN
+                breaker.skipped = 0
+                self._save(key, breaker)
+                count += 1
+        return count
+
+    def _save(self, key: tuple[int, int], breaker: Breaker):
+        db_writer.execute(
+            """
+            INSERT OR REPLACE INTO circuit_breakers
+                (challenge_id, team_id, state, failures, skipped, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                *key,
+                breaker.state,
+                breaker.failures,
+                breaker.skipped,
+                breaker.reason,
+            ),
+        )
+
+
+breakers = CircuitBreakers()
+
+
+def probe_targets(
+    targets: list[ServiceDetails], timeout: float
+) -> dict[tuple[str, int], float | None]:
+    """Try a non-blocking TCP connect to every target at once.
+
+    Returns the connect time in seconds per (ip, port), or None when the
+    service refused, errored or did not answer within `timeout`.
+    """
+    results: dict[tuple[str, int], float | None] = {}
+    pending: dict[socket.socket, tuple[str, int]] = {}
+    start = time.monotonic()
+
+    with selectors.DefaultSelector() as sel:
+        for target in targets:
+            address = (target.ip, target.port)
+            if address in results:
+                continue
+            results[address] = None
+
+            try:
+                family, type_, proto, _, sockaddr = socket.getaddrinfo(
+                    target.ip, target.port, type=socket.SOCK_STREAM
+                )[0]
+                sock = socket.socket(family, type_, proto)
+            except OSError:
+                continue
+
+            sock.setblocking(False)
+            if sock.connect_ex(sockaddr) not in (
+                0,
+                errno.EINPROGRESS,
+                errno.EWOULDBLOCK,
+            ):
+                sock.close()
+                continue
+
+            pending[sock] = address
+            _ = sel.register(sock, selectors.EVENT_WRITE)
+
+        try:
+            while pending:
+                remaining = start + timeout - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                for key, _ in sel.select(remaining):
+                    sock = t.cast(socket.socket, key.fileobj)
+                    _ = sel.unregister(sock)
+                    address = pending.pop(sock)
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        results[address] = time.monotonic() - start
+                    sock.close()
+        finally:
+            for sock in pending:
+                sock.close()
+
+    return results
+
+
+def plan_targets(candidates: list[ServiceDetails]) -> list[ServiceDetails]:
+    """Decide which of the round's targets to attack, in order."""
+    targets: list[ServiceDetails] = []
+    decisions: dict[tuple[int, int], str | None] = {}  # one cooldown step per round
+    for target in candidates:
+        key = target_key(target)
+        if key not in decisions:
+            decisions[key] = breakers.allow(target)
+        skip_reason = decisions[key]
+        if skip_reason:
+            logger.info(
+                f'Breaker: skipping {target.team_name} ({target.team_id}) ({target.ip}:{target.port}): {skip_reason}'
+            )
+            continue
+        targets.append(target)
+
+    if not targets or FARMER_PROBE_TIMEOUT <= 0:
+        return targets
+
+    probes = probe_targets(targets, FARMER_PROBE_TIMEOUT)
+
+    up: list[ServiceDetails] = []
+    down: list[ServiceDetails] = []
+    for target in targets:
+        elapsed = probes.get((target.ip, target.port))
+        if elapsed is None:
+            logger.warning(
+                f'Probe: {target.team_name} ({target.team_id}) ({target.ip}:{target.port}) is unreachable'
+            )
+            down.append(target)
+        else:
+            logger.info(
+                f'Probe: {target.team_name} ({target.team_id}) ({target.ip}:{target.port}) is up ({elapsed * 1000:.0f} ms)'
+            )
+            up.append(target)
+
+    if down:
+        logger.info(
+            f'Probe: {len(up)} target(s) up, {len(down)} unreachable'
+            f' ({"deferred to the end of the round" if FARMER_PROBE_DEFER else "skipped"}).'
+        )
+
+    return up + down if FARMER_PROBE_DEFER else up
+
+
+@dataclass
+class TargetYield:
+    """A target's recent history from the run log and the flags table."""
+
+    runs: int = 0
+    successes: int = 0
+    duration: float = 0.0  # mean runtime
+    settled: int = 0  # flags the platform already judged
+    accepted: int = 0
+
+    @property
+    def score(self) -> float:
+        """Chance of an accepted flag, discounted for slow runs.
+
+        Unknown rates count as 1/2, a run taking the full `FARMER_TIMEOUT`
+        halves the score.
+        """
+        success = (self.successes + 1) / (self.runs + 2)
+        accepted = (self.accepted + 1) / (self.settled + 2)
+        runtime = self.duration if self.runs else FARMER_TIMEOUT / 2
+        return success * accepted / (1 + runtime / FARMER_TIMEOUT)
+
+
+def load_yields() -> dict[tuple[int, int], TargetYield]:
+    window = f'-{int(FARMER_PRIORITY_WINDOW)} seconds'
+    yields: dict[tuple[int, int], TargetYield] = {}
+    try:
+        with sqlite3.connect(DATABASE_PATH, timeout=8) as conn:
+            for challenge_id, team_id, runs, successes, duration in conn.execute(
+                """
+                SELECT challenge_id, team_id, COUNT(*), SUM(flags > 0), AVG(duration)
+                FROM runs
+                WHERE timestamp >= datetime('now', ?)
+                GROUP BY challenge_id, team_id
+                """,
+                (window,),
+            ):
+                stats = yields.setdefault((challenge_id, team_id), TargetYield())
+                stats.runs, stats.successes, stats.duration = runs, successes, duration
+
+            for challenge_id, team_id, settled, accepted in conn.execute(
+                """
+                SELECT challenge_id, team_id, COUNT(*), SUM(status = ?)
+                FROM flags
+                WHERE timestamp >= datetime('now', ?) AND status NOT IN (?, ?)
+                GROUP BY challenge_id, team_id
+                """,
+                # flags of port-keyed targets only have challenge id -1, so
+                # their acceptance rate stays unknown
+                (
+                    FlagStatus.ACCEPTED,
+                    window,
+                    FlagStatus.UNKNOWN,
+                    FlagStatus.SUBMITTING,
+                ),
+            ):
+                stats = yields.setdefault((challenge_id, team_id), TargetYield())
+                stats.settled, stats.accepted = settled, accepted
+    except Exception as e:
+        logger.error(f'Error loading target history from database: {e}')
+
+    return yields
+
+
+def prioritize(
+    targets: list[ServiceDetails], yields: dict[tuple[int, int], TargetYield]
+) -> list[ServiceDetails]:
+    """Order targets by score, keeping every n-th slot for the least tried one.
+
+    The reserved share (`FARMER_PRIORITY_EXPLORE`) stops targets that once
+    failed from sinking to a place the round deadline never reaches.
+    """
+    if len(targets) < 2:
+        return targets
+
+    stats = [yields.get(target_key(t), TargetYield()) for t in targets]
+    ranked = sorted(range(len(targets)), key=lambda i: stats[i].score, reverse=True)
+    least_tried = sorted(ranked, key=lambda i: stats[i].runs)
+    every = round(1 / FARMER_PRIORITY_EXPLORE) if FARMER_PRIORITY_EXPLORE > 0 else 0
+
+    order: list[int] = []
+    used: set[int] = set()
+    while len(order) < len(targets):
+        explore = every > 1 and (len(order) + 1) % every == 0
+        i = next(i for i in (least_tried if explore else ranked) if i not in used)
+        used.add(i)
+        order.append(i)
+
+    for i in order:
+        target = targets[i]
+        logger.debug(
+            f'Priority: {target.team_name} ({target.team_id}) ({target.ip}:{target.port})'
+            f' score {stats[i].score:.3f}, {stats[i].successes}/{stats[i].runs} runs with flags'
+        )
+
+    return [targets[i] for i in order]
+
+
+def fetch_services(
+    spec: ExploitSpec, cache: dict[int | None, list[PlatformService]]
+) -> list[PlatformService]:
+    """Services of the spec's challenge, with the spec's port when rewriting.
+
+    Only ailurus filters services by challenge, so the other platforms fetch
+    the full list once per round and share it between specs through `cache`.
+    """
+    key = spec.challenge_id if PLATFORM in ['ailurus'] else None
+    if key not in cache:
+        cache[key] = list(
+            platform.get_services(
+                {
+                    'challenge_id': spec.challenge_id,
+                }
+                if key is not None and key != -1
+                else {}
+            )
+        )
+
+    services: list[PlatformService] = []
+    for service in cache[key]:
+        if spec.rewrite_port:
+            try:
+                ip_str = service.addresses[0].rsplit(':', 1)[0]
+            except (ValueError, AttributeError, IndexError):
+                # If the address is malformed or missing, skip modifying this service
+                services.append(service)
+                continue
+            service = replace(service, addresses=[f'{ip_str}:{spec.port}'])
+
+        if service.challenge_id is None and spec.challenge_id != -1:
+            service = replace(service, challenge_id=spec.challenge_id)
+
+        services.append(service)
+
+    return services
+
+
+def plan_round(specs: list[ExploitSpec]) -> list[ExploitJob]:
+    """Build the round's jobs for every exploit, interleaved across challenges.
+
+    Breakers and the probe run once over the targets of all specs. Each
+    challenge then gets its own queue of (target, exploit) jobs and the
+    queues are merged round-robin, so a challenge with many exploits or
+    targets cannot hold the worker budget until the others get a turn.
+    """
+    cache: dict[int | None, list[PlatformService]] = {}
+    yields = load_yields() if FARMER_PRIORITY else {}
+    owners: dict[int, ExploitSpec] = {}
+    candidates: list[ServiceDetails] = []
+    for spec in specs:
+        try:
+            services = fetch_services(spec, cache)
+        except requests.RequestException as e:
+            logger.error(f'Network error fetching services: {e}')
+            continue
+        except ValueError as e:
+            logger.error(f'Error fetching services: {e}')
+            continue
+
+        targets = build_targets(services)
+        if FARMER_PRIORITY:
+            targets = prioritize(targets, yields)
+
+        for target in targets:
+            owners[id(target)] = spec
+            candidates.append(target)
+
+    if not candidates:
+        return []
+
+    # versions are taken before the breakers are asked, so a fixed exploit
+    # gets its trial runs this round instead of after the cooldown
+    versions: dict[int, list[tuple[str, ExploitVersion]]] = {}
+    for spec in specs:
+        versions[id(spec)] = []
+        for exploit in exploits.expand(spec.filenames):
+            known = exploits.versions.get(exploit)
+            version = exploits.current(exploit)
+            if not version:
+                continue
+            versions[id(spec)].append((exploit, version))
+            if known and known.version != version.version:
+                forget_runtimes(exploit)
+                keys = {
+                    target_key(target)
+                    for target in candidates
+                    if owners[id(target)] is spec
+                }
+                if count := breakers.half_open(keys):
+                    logger.info(
+                        f'New version of {exploit}: trial run against {count} skipped target(s).'
+                    )
+
+    queues: dict[int, list[ExploitJob]] = {id(spec): [] for spec in specs}
+    for target in plan_targets(candidates):
+        spec = owners[id(target)]
+        queues[id(spec)].extend(
+            ExploitJob(target, exploit, version.version, version.path)
+            for exploit, version in versions[id(spec)]
+        )
+
+    return [
+        job
+        for jobs in itertools.zip_longest(*queues.values())
+        for job in jobs
+        if job is not None
+    ]
+
+
+@dataclass
+class RuntimeStats:
+    """Exponentially weighted mean and variance of a target's exploit runtime."""
+
+    mean: float = 0.0
+    var: float = 0.0
+    samples: int = 0
+
+    def update(self, value: float):
+        if not self.samples:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            incr = FARMER_TIMEOUT_ALPHA * diff
+            self.mean += incr
+            self.var = (1 - FARMER_TIMEOUT_ALPHA) * (self.var + diff * incr)
+        self.samples += 1
+
+
+runtime_stats: dict[tuple[str, int, int], RuntimeStats] = {}
+runtime_stats_lock = threading.Lock()
+
+
+def forget_runtimes(filename: str):
+    """Drop the runtimes of an exploit, its new version may be slower."""
+    with runtime_stats_lock:
+        for key in [key for key in runtime_stats if key[0] == filename]:
+            del runtime_stats[key]
+
+
+TIMEOUT_Z = statistics.NormalDist().inv_cdf(FARMER_TIMEOUT_PERCENTILE)
+
+
+def target_timeout(target: ServiceDetails, filename: str) -> float:
+    """High percentile of the exploit's runtime against the target, clamped."""
+    if not FARMER_ADAPTIVE_TIMEOUT:
+        return FARMER_TIMEOUT
+
+    with runtime_stats_lock:
+        stats = runtime_stats.get((filename, *target_key(target)))
+        if stats is None or stats.samples < FARMER_TIMEOUT_MIN_SAMPLES:
+            return FARMER_TIMEOUT
+
+        timeout = stats.mean + TIMEOUT_Z * math.sqrt(stats.var)
+
+    return min(FARMER_TIMEOUT, max(FARMER_TIMEOUT_FLOOR, timeout))
+
+
+def record_runtime(
+    target: ServiceDetails, filename: str, result: ExploitOutcome, timeout: float
+):
+    # A timed out run only tells us it needs more than `timeout`, so guess
+    # twice that; the timeout then grows back quickly when a service slows.
+    value = timeout * 2 if result.timeout else result.duration
+
+    with runtime_stats_lock:
+        key = (filename, *target_key(target))
+        runtime_stats.setdefault(key, RuntimeStats()).update(value)
+
+
+class ConcurrencyController:
+    """AIMD limit on in-flight exploits, adjusted once per round.
+
+    The limit grows by one each round the box keeps up. It halves when the
+    load average per CPU, the timeout rate or the median runtime (against
+    its running baseline) shows the exploits are competing for the host.
+    """
+
+    def __init__(self) -> None:
+        self.limit = min(
+            FARMER_CONCURRENCY_MAX, max(FARMER_CONCURRENCY_MIN, FARMER_MAX_WORKERS)
+        )
+        self.baseline: float | None = None
+        self.durations: list[float] = []
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def observe(self, result: ExploitOutcome):
+        with self.lock:
+            self.durations.append(result.duration)
+            self.timeouts += result.timeout
+
+    def adjust(self) -> int:
+        with self.lock:
+            durations, self.durations = self.durations, []
+            timeouts, self.timeouts = self.timeouts, 0
+
+        if not FARMER_ADAPTIVE_CONCURRENCY or not durations:
+            return self.limit
+
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            load = 0.0  # not available on Windows
+
+        timeout_rate = timeouts / len(durations)
+        latency = statistics.median(durations)
+
+        old = self.limit
+        reason = ''
+        if load > FARMER_CONCURRENCY_MAX_LOAD:
+            reason = f'load {load:.2f}/cpu'
+        elif timeout_rate > FARMER_CONCURRENCY_MAX_TIMEOUT_RATE:
+            reason = f'{timeout_rate:.0%} timeouts'
+        elif self.baseline and latency > self.baseline * 1.5:
+            reason = f'runtime {latency:.1f}s vs {self.baseline:.1f}s'
+
+        if reason:
+            self.limit = max(FARMER_CONCURRENCY_MIN, self.limit // 2)
+        else:
+            # Only grow when the round actually had more work than slots.
+            if len(durations) > self.limit:
+                self.limit = min(FARMER_CONCURRENCY_MAX, self.limit + 1)
+            self.baseline = (
+                latency
+                if self.baseline is None
+                else 0.8 * self.baseline + 0.2 * latency
+            )
+
+        logger.info(
+            f'Concurrency: {old} -> {self.limit}'
+            f' (load {load:.2f}/cpu, {timeout_rate:.0%} timeouts,'
+            f' median runtime {latency:.1f}s{", backing off: " + reason if reason else ""})'
+        )
+        return self.limit
+
+
+concurrency = ConcurrencyController()
+
+
+class TickClock:
+    """Tracks where the game's ticks start and when the next round is due.
+
+    Ticks start every `INTERVAL` seconds at `FARMER_TICK_OFFSET` past the
+    epoch-aligned boundary. With `FARMER_TICK_INFER`, each time a target
+    hands out a flag it never gave before, the boundary must lie between the
+    previous capture from that target and this one. Windows wider than
+    `FARMER_TICK_WINDOW_MAX` of the interval say little and are ignored; the
+    offset is moved to the earliest point most of the others agree on.
+
+    Rounds capture from a target at most once a round, too far apart for
+    that, so `probe` attacks one target twice a tick to get narrow windows.
+    """
+
+    def __init__(self) -> None:
+        self.offset = float(FARMER_TICK_OFFSET % INTERVAL)
+        self.last_seen: dict[tuple[int, int], float] = {}
+        self.flags: dict[tuple[int, int], set[str]] = {}
+        self.windows: deque[tuple[float, float]] = deque(maxlen=32)
+        self.lock = threading.Lock()
+
+        # the probe bracket: phase it starts at, its width, and whether the
+        # boundary is known to be inside
+        self.probe_job: ExploitJob | None = None
+        reach = INTERVAL * FARMER_TICK_WINDOW_MAX / 2
+        self.low = (self.offset - reach) % INTERVAL
+        self.width = 2 * reach
+        self.bracketed = False
+
+    def observe(self, target: ServiceDetails, flags: list[str]):
+        now = time.time()
+        key = target_key(target)
+
+        with self.lock:
+            known = self.flags.setdefault(key, set())
+            last_seen = self.last_seen.get(key)
+            self.last_seen[key] = now
+
+            new = set(flags) - known
+            if not new:
+                return
+
+            known.update(new)
+            if last_seen is None or now - last_seen >= INTERVAL:
+                return
+
+            self.windows.append((last_seen % INTERVAL, now % INTERVAL))
+
+        if FARMER_TICK_INFER:
+            self.infer()
+
+    def infer(self):
+        with self.lock:
+            windows = [
+                (start, end)
+                for start, end in self.windows
+                if (end - start) % INTERVAL <= INTERVAL * FARMER_TICK_WINDOW_MAX
+            ]
+
+        def contains(window: tuple[float, float], phase: float) -> bool:
+            start, end = window
+            if start <= end:
+                return start < phase <= end
+            return phase > start or phase <= end  # wraps past the interval
+
+        # The boundary lies in the intersection of the windows, which starts
+        # at one of their start points: take the one most windows agree on.
+        best, best_votes = self.offset, 0
+        for start, _ in windows:
+            phase = (start + 1e-6) % INTERVAL
+            votes = sum(contains(window, phase) for window in windows)
+            if votes > best_votes:
+                best, best_votes = start, votes
+
+        if best_votes and best != self.offset:
+            logger.info(
+                f'Tick: boundary at +{best:.1f}s of the interval'
+                f' ({best_votes}/{len(windows)} flag changes agree, was +{self.offset:.1f}s)'
+            )
+            self.offset = best
+
+    def offer(self, job: ExploitJob):
+        """A job that just gave flags, for `probe` to use."""
+        with self.lock:
+            if self.probe_job is None:
+                self.probe_job = job
+
+    def probe(self):
+        """Narrow down the tick boundary by attacking one target around it.
+
+        The target is attacked at both ends of a bracket each tick. While its
+        flags do not change inside, the bracket slides on by its width. Once
+        they do, the bracket is halved every tick, bisecting the boundary
+        down to half of FARMER_TICK_DELAY, and then kept there to follow
+        drift. The captures feed `observe` like any other.
+
+        A run reads the flag somewhere between its start and end, so a change
+        places the boundary between the first run's start and the second's
+        end, and no change only rules out what lies before the second's start.
+        """
+        reach = INTERVAL * FARMER_TICK_WINDOW_MAX / 2
+        while not stop_event.is_set():
+            with self.lock:
+                job = self.probe_job
+                low, width, bracketed = self.low, self.width, self.bracketed
+            if job is None:
+                _ = stop_event.wait(FARMER_WAKE)
+                continue
+
+            narrow = bracketed and width > FARMER_TICK_DELAY / 2
+            span = width / 2 if narrow else width
+            start = time.time() + (low - time.time()) % INTERVAL
+            before = self._probe_run(job, start)
+            if before is None:
+                continue
+            # start the second run early by how long the first took, so it
+            # ends where the bracket does
+            lead = before[2] - before[1]
+            after = self._probe_run(job, max(before[2], start + span - lead))
+            if after is None:
+                continue
+
+            (flags_before, low_at, _), (flags_after, high_at, high_end) = before, after
+            changed = bool(set(flags_after) - set(flags_before))
+            with self.lock:
+                if changed:
+                    self.low = low_at % INTERVAL
+                    self.width = high_end - low_at
+                    self.bracketed = True
+                elif narrow:
+                    self.low = high_at % INTERVAL
+                    self.width = max(
+                        FARMER_TICK_DELAY / 2, width - (high_at - low) % INTERVAL
+                    )
+                elif bracketed:
+                    # the boundary moved out, look again around the bracket
+                    self.low = (low - reach) % INTERVAL
+                    self.width, self.bracketed = 2 * reach, False
+                else:
+                    self.low = high_at % INTERVAL
+
+    def _probe_run(
+        self, job: ExploitJob, at: float
+    ) -> tuple[list[str], float, float] | None:
+        """Flags of one run started at `at`, with its start and end time."""
+        if stop_event.wait(max(0.0, at - time.time())):
+            return None
+
+        target = job.target
+        start = time.time()
+        result = run_exploit(
+            target.ip,
+            target.port,
+            job.path or job.filename,
+            on_flags=functools.partial(record_flags, target),
+            timeout=target_timeout(target, job.filename),
+            env=exploit_env(target),
+        )
+        if not result.flags:
+            # let the next round offer a target that still gives flags
+            with self.lock:
+                if self.probe_job is job:
+                    self.probe_job = None
+            return None
+        return result.flags, start, time.time()
+
+    def next_round(self) -> float:
+        """Seconds until `FARMER_TICK_DELAY` into the next tick."""
+        phase = (time.time() - self.offset - FARMER_TICK_DELAY) % INTERVAL
+        return INTERVAL - phase
+
+    def round_budget(self) -> float:
+        """Seconds a round starting now may run, never past the tick's end."""
+        if FARMER_ROUND_BUDGET <= 0:
+            return math.inf
+
+        budget = INTERVAL * FARMER_ROUND_BUDGET
+        if FARMER_TICK_ALIGN:
+            left = INTERVAL - (time.time() - self.offset) % INTERVAL
+            # a round started just before a boundary (the first one) attacks
+            # the next tick's flags, so it may run until that tick ends
+            budget = min(budget, left if left > FARMER_TIMEOUT else left + INTERVAL)
+        return budget
+
+
+ticks = TickClock()
+
+
+class RoundBudget:
+    """Deadline of one round and the exploits that had to give way to it.
+
+    Exploits that would start with less than `FARMER_TIMEOUT_FLOOR` seconds
+    left are dropped. The others get their timeout clamped to the time left,
+    so stragglers are killed at the deadline by the usual timeout path.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.dropped: list[ExploitJob] = []
+        self.cut: list[ExploitJob] = []
+        self.lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def wait_timeout(self) -> float | None:
+        """How long to wait for running exploits before killing them."""
+        if math.isinf(self.deadline):
+            return None
+        return max(0.0, self.remaining()) + 5
+
+    def clamp(self, jobs: list[ExploitJob], timeout: float) -> float | None:
+        """Timeout to start `jobs` with, or None when they are dropped."""
+        remaining = self.remaining()
+        if remaining < min(timeout, FARMER_TIMEOUT_FLOOR):
+            with self.lock:
+                self.dropped.extend(jobs)
+            return None
+        return min(timeout, remaining)
+
+    def mark_cut(self, job: ExploitJob, result: ExploitOutcome):
+        result.cut = True
+        with self.lock:
+            self.cut.append(job)
+
+    def report(self, planned: int):
+        if not self.cut and not self.dropped:
+            return
+
+        logger.warning(
+            f'Round: {len(self.cut)} exploit(s) cut and {len(self.dropped)} dropped'
+            f' at the {self.seconds:.0f}s deadline, {planned} planned.'
+        )
+        for label, jobs in (('cut', self.cut), ('dropped', self.dropped)):
+            for job in jobs:
+                logger.warning(
+                    f'\t{label}: {job.exploit} against'
+                    f' {job.target.team_name} ({job.target.team_id}) ({job.target.ip}:{job.target.port})'
+                )
+
+
+def run_target(job: ExploitJob, budget: RoundBudget) -> ExploitOutcome | None:
+    target, filename = job.target, job.filename
+    full_timeout = target_timeout(target, filename)
+    timeout = budget.clamp([job], full_timeout)
+    if timeout is None:
+        return None
+
+    on_flags = functools.partial(record_flags, target)
+    env = exploit_env(target)
+
+    start = time.monotonic()
+    server = forkservers.get(filename)
+    if server:
+        result = run_exploit_forked(
+            server,
+            target.ip,
+            target.port,
+            on_flags=on_flags,
+            timeout=timeout,
+            env=env,
+        )
+    else:
+        result = run_exploit(
+            target.ip,
+            target.port,
+            job.path or filename,
+            on_flags=on_flags,
+            timeout=timeout,
+            env=env,
+        )
+    result.duration = time.monotonic() - start
+
+    if result.timeout and timeout < full_timeout:
+        budget.mark_cut(job, result)
+    else:
+        record_runtime(target, filename, result, timeout)
+        concurrency.observe(result)
+    return result
+
+
+async def run_target_async(
+    semaphore: asyncio.Semaphore, job: ExploitJob, budget: RoundBudget
+) -> ExploitOutcome | None:
+    target, filename = job.target, job.filename
+    async with semaphore:
+        full_timeout = target_timeout(target, filename)
+        timeout = budget.clamp([job], full_timeout)
+        if timeout is None:
+            return None
+
+        start = time.monotonic()
+        result = await run_exploit_async(
+            target.ip,
+            target.port,
+            job.path or filename,
+            on_flags=functools.partial(record_flags, target),
+            timeout=timeout,
+            env=exploit_env(target),
+        )
+        result.duration = time.monotonic() - start
+
+    if result.timeout and timeout < full_timeout:
+        budget.mark_cut(job, result)
+    else:
+        record_runtime(target, filename, result, timeout)
+        concurrency.observe(result)
+    return result
+
+
+def describe_target(target: ServiceDetails, filename: str) -> str:
+    timeout = target_timeout(target, filename)
+    suffix = f' (timeout {timeout:.1f}s)' if timeout < FARMER_TIMEOUT else ''
+    return f'{target.team_name} ({target.team_id}) ({target.ip}:{target.port}){suffix}'
+
+
+def record_flags(service_detail: ServiceDetails, flags: list[str]):
+    ticks.observe(service_detail, flags)
+    for flag in flags:
+        if not seen_flags.add(flag):
+            continue
+
+        logger.info(
+            f'\tFound flag {flag} from {service_detail.team_name} ({service_detail.team_id})'
+        )
+        db_writer.add_flag(
+            Flag(
+                team_id=service_detail.team_id,
+                team_name=service_detail.team_name,
+                challenge_id=service_detail.challenge_id,
+                challenge_name=service_detail.challenge_name,
+                flag=flag,
+                status=FlagStatus.UNKNOWN,
+            ),
+        )
+
+
+def handle_outcome(job: ExploitJob, result: ExploitOutcome):
+    report_outcome(job.target, result)
+    if not result.cut:
+        log_run(job, result)
+        exploits.observe(job, result)
+    if FARMER_TICK_INFER and result.flags and not result.timeout:
+        ticks.offer(job)
+
+
+def log_run(job: ExploitJob, result: ExploitOutcome):
+    db_writer.execute(
+        """
+        INSERT INTO runs (challenge_id, team_id, exploit, exploit_version, flags, return_code, timeout, duration)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            *target_key(job.target),
+            os.path.basename(job.filename),
+            job.version,
+            len(result.flags),
+            result.return_code,
+            result.timeout,
+            result.duration,
+        ),
+    )
+
+
+def report_outcome(service_detail: ServiceDetails, result: ExploitOutcome):
+    logger.info(
+        f'Exploit result from {service_detail.team_name} ({service_detail.team_id}) ({service_detail.ip}:{service_detail.port}):'
+    )
+
+    # Streamed runs stored their flags as they were printed, even if the
+    # exploit hung or crashed afterwards.
+    if result.flags:
+        logger.info(f'\tFound {len(result.flags)} unique flag(s).')
+
+    if result.cut:
+        logger.warning(
+            f'\tExploit cut at the round deadline after {result.duration:.1f} seconds.'
+        )
+        if result.flags:
+            breakers.record(service_detail, True)
+        return
+
+    if result.timeout:
+        logger.error(f'\tExploit timed out after {result.duration:.1f} seconds.')
+        breakers.record(service_detail, bool(result.flags), 'timed out')
+        return
+
+    if result.return_code != 0:
+        if result.out:
+            logger.debug('\tstdout:')
+            for line in result.out.decode(errors='replace').splitlines():
+                logger.debug(f'\t\t{line}')
+
+        if result.err:
+            logger.error('\tstderr:')
+            for line in result.err.decode(errors='replace').splitlines():
+                logger.error(f'\t\t{line}')
+
+        logger.info(f'\tReturn code: {result.return_code}')
+        breakers.record(
+            service_detail, bool(result.flags), f'return code {result.return_code}'
+        )
+        return
+
+    if result.flags:
+        breakers.record(service_detail, True)
+        return
+
+    flags = FlagScanner().feed(result.out)
+    if not flags:
+        logger.warning('\tNo flag found.')
+        breakers.record(service_detail, False, 'no flag found')
+        return
+
+    logger.info(f'\tFound {len(flags)} unique flag(s).')
+    record_flags(service_detail, flags)
+    result.flags = flags
+    breakers.record(service_detail, True)
+
+
+def exploit_services(
+    ex: ThreadPoolExecutor, jobs: list[ExploitJob], budget: RoundBudget
+):
+    futures: dict[Future[ExploitOutcome | None], ExploitJob] = {}
+    for job in jobs:
+        logger.info(
+            f'Running {job.exploit} against {describe_target(job.target, job.filename)}'
+        )
+
+        fut = ex.submit(run_target, job, budget)
+        futures[fut] = job
+
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=budget.wait_timeout()):
+            pending.discard(future)
+            if result := future.result():
+                handle_outcome(futures[future], result)
+    except concurrent.futures.TimeoutError:
+        # timeouts are clamped to the deadline, this only catches runs that
+        # did not go away when their timeout fired
+        logger.warning('Round deadline passed, killing remaining exploits...')
+        terminate_childs()
+        for future in as_completed(pending):
+            if result := future.result():
+                handle_outcome(futures[future], result)
+
+
+def exploit_services_batch(jobs: list[ExploitJob], budget: RoundBudget):
+    """Run one batch process per exploit file, all of them at once."""
+    groups: dict[str, list[ExploitJob]] = {}
+    for job in jobs:
+        groups.setdefault(job.filename, []).append(job)
+
+    if len(groups) == 1:
+        for group in groups.values():
+            run_batch(group, budget)
+        return
+
+    with ThreadPoolExecutor(max_workers=len(groups)) as ex:
+        for future in [
+            ex.submit(run_batch, group, budget) for group in groups.values()
+        ]:
+            future.result()
+
+
+def run_batch(jobs: list[ExploitJob], budget: RoundBudget):
+    """Attack every target of the round with a single exploit process.
+
+    The exploit is started as `exploit.py --batch` and reads one JSON object
+    per line from stdin (the `ServiceDetails` fields plus an `id`). For each
+    target it prints one JSON line back:
+
+        {"id": 0, "output": "...", "error": "...", "return_code": 0}
+
+    `output` is scanned for flags like a normal run's stdout; `error` and
+    `return_code` are optional. Other stdout lines are only logged. Results
+    are handled as soon as their line arrives.
+    """
+    targets = [job.target for job in jobs]
+    filename = jobs[0].path or jobs[0].filename
+    timeout = budget.clamp(jobs, FARMER_BATCH_TIMEOUT)
+    if timeout is None:
+        return
+
+    cwd, file, env = exploit_process(filename, exploit_env())
+
+    logger.info(
+        f'Running batch exploit {jobs[0].exploit} against {len(targets)} target(s)'
+    )
+    start = time.monotonic()
+
+    payload = b''.join(
+        json.dumps(
+            {'id': i, **asdict(target), 'cache_scope': cache_scope(target)}
+        ).encode()
+        + b'\n'
+        for i, target in enumerate(targets)
+    )
+
+    results: dict[int, ExploitOutcome] = {}
+    buffer = bytearray()
+    skip_line = False
+    max_line = FARMER_OUTPUT_HEAD + FARMER_OUTPUT_TAIL
+
+    def on_out(chunk: bytes):
+        nonlocal skip_line
+        buffer.extend(chunk)
+        while (end := buffer.find(b'\n')) != -1:
+            line = bytes(buffer[:end]).strip()
+            del buffer[: end + 1]
+
+            if skip_line:
+                skip_line = False
+                continue
+
+            try:
+                record = json.loads(line)
+                target_id = int(record['id'])
+                job = jobs[target_id]
+                output = str(record.get('output') or '').encode()
+                error = str(record.get('error') or '').encode()
+                return_code = int(record.get('return_code') or 0)  # optional
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                if line:
+                    logger.debug(f'\t[batch] {line.decode(errors="replace")}')
+                continue
+
+            if target_id in results:
+                continue
+
+            result = ExploitOutcome(
+                output, error, return_code, False, duration=time.monotonic() - start
+            )
+            results[target_id] = result
+            handle_outcome(job, result)
+
+        if len(buffer) > max_line:
+            logger.warning(f'Dropping batch output line longer than {max_line} bytes')
+            buffer.clear()
+            skip_line = True
+
+    if os.name == 'nt':
+        proc = subprocess.Popen(
+            [sys.executable, file, '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+        )
+    else:
+        proc = subprocess.Popen(
+            [sys.executable, file, '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            preexec_fn=os.setsid,
+        )
+
+    register_child(proc)
+
+    out = OutputBuffer('batch.out')
+    err = OutputBuffer('batch.err')
+    try:
+        assert proc.stdin and proc.stdout and proc.stderr
+        try:
+            _ = proc.stdin.write(payload)
+            proc.stdin.close()
+        except OSError as e:
+            logger.error(f'Error writing targets to batch exploit: {e}')
+
+        timed_out = read_pipes(
+            proc.stdout.fileno(),
+            proc.stderr.fileno(),
+            time.monotonic() + timeout,
+            out,
+            err,
+            on_out,
+        )
+        on_out(b'\n')  # flush a trailing record without newline
+
+        if timed_out:
+            terminate_child(proc)
+            logger.error(f'Batch exploit timed out after {timeout:.0f} seconds.')
+
+        try:
+            rc = proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            terminate_child(proc)
+            rc = -1
+    finally:
+        if proc.poll() is None:  # reading failed, don't leave it running
+            terminate_child(proc)
+        out.close()
+        err.close()
+        unregister_child(proc)
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            if pipe:
+                pipe.close()
+
+    # Targets the exploit never reported on share the process' fate.
+    stderr = err.getvalue()
+    for i, job in enumerate(jobs):
+        if i in results:
+            continue
+
+        duration = time.monotonic() - start
+        if timed_out:
+            result = ExploitOutcome(b'', stderr, -1, True, duration=duration)
+            if timeout < FARMER_BATCH_TIMEOUT:
+                budget.mark_cut(job, result)
+            handle_outcome(job, result)
+        else:
+            handle_outcome(
+                job,
+                ExploitOutcome(
+                    b'',
+                    stderr or b'No result record',
+                    rc or -1,
+                    False,
+                    duration=duration,
+                ),
+            )
+
+
+async def exploit_services_async(jobs: list[ExploitJob], budget: RoundBudget):
+    semaphore = asyncio.Semaphore(
+        concurrency.limit
+        if FARMER_ADAPTIVE_CONCURRENCY
+        else FARMER_ASYNC_MAX_CONCURRENCY
+    )
+
+    tasks: dict[asyncio.Future[ExploitOutcome | None], ExploitJob] = {}
+    for job in jobs:
+        logger.info(
+            f'Running {job.exploit} against {describe_target(job.target, job.filename)}'
+        )
+
+        task = asyncio.ensure_future(run_target_async(semaphore, job, budget))
+        tasks[task] = job
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=budget.wait_timeout(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                logger.warning('Round deadline passed, killing remaining exploits...')
+                terminate_childs()
+
+            for task in done:
+                if result := task.result():
+                    handle_outcome(tasks[task], result)
+    finally:
+        for task in pending:
+            _ = task.cancel()
+
+
+def resolve_specs() -> list[ExploitSpec]:
+    """Turn the `<challenge>=<exploit.py>` arguments into exploit specs."""
+    specs: list[ExploitSpec] = []
+    for key, filenames in exploit_map.items():
+        if PLATFORM in ['ailurus']:
+            specs.append(ExploitSpec(key, -1, False, filenames))
+        elif PLATFORM in ['gemastik25']:
+            challenge = platform.challenges_by_id.get(key)
+            if challenge is None or challenge.port is None:
+                logger.error(f'Challenge ID {key} not found.')
+                sys.exit(1)
+
+            specs.append(ExploitSpec(key, challenge.port, True, filenames))
+        else:
+            # no challenges on this platform, the key is the service port
+            specs.append(ExploitSpec(-1, key, True, filenames))
+
+        logger.info(
+            f'Challenge {key}: {", ".join(os.path.basename(f) for f in filenames)}'
+        )
+
+    return specs
+
+
+def refresh_startup_cache(selections: dict[str, dict[str, int]], stale: bool):
+    """Keep the startup cache fresh while the farmer runs.
+
+    Data restored from the cache is refetched right away, off the main
+    thread so the first round is not held up, then every half of
+    STARTUP_CACHE_MAX_AGE.
+    """
+    while True:
+        try:
+            if stale:
+                platform.refresh(relogin=not TOKEN and bool(USERNAME and PASSWORD))
+            # other farmers may have saved their own selection meanwhile
+            current = startup_cache.load().get('selections', {})
+            startup_cache.save(
+                **platform.snapshot(), selections={**current, **selections}
+            )
+        except Exception as e:
+            logger.warning(f'Could not refresh startup cache: {e}')
+
+        if stop_event.wait(STARTUP_CACHE_MAX_AGE / 2):
+            return
+        stale = True
+
+
+def main():
+    cached = startup_cache.load()
+    platform.restore(cached)
+
+    try:
+        _ = platform.login()
+        logger.info(f'Logged in, token: {platform.token}')
+    except requests.HTTPError as e:
+        logger.critical(f'Failed to log in: {e}')
+        sys.exit(1)
+
+    # i hate this..
+    challenge_id = -1
+    port = -1
+
+    selections: dict[str, dict[str, int]] = cached.get('selections', {})
+    selection = None if exploit_map else selections.get(os.path.basename(filename))
+    if selection:
+        challenge_id, port = selection['challenge_id'], selection['port']
+        logger.info(
+            f'Using last selection: challenge {challenge_id}, port {port}'
+            f' (delete {STARTUP_CACHE_PATH} to choose again).'
+        )
+
+    teams = None
+    challenges = None
+
+    try:
+        teams = list(platform.list_teams())
+        if teams:
+            logger.info(f'Found {len(teams)} teams.')
+            for team in teams:
+                logger.info(f'\tTeam {team.id}: {team.name}')
+    except requests.RequestException as e:
+        logger.error(f'Network error fetching teams: {e}')
+    except ValueError as e:
+        logger.error(f'Error fetching teams: {e}')
+
+    if PLATFORM in ['ailurus', 'gemastik25']:
+        try:
+            challenges = list(platform.list_challenges())
+            if challenges:
+                logger.info(f'Found {len(challenges)} challenges.')
+                for challenge in challenges:
+                    logger.info(f'\tChallenge {challenge.id}: {challenge.title}')
+
+            if (
+                not exploit_map
+                and not selection
+                and (
+                    PLATFORM in ['ailurus']
+                    or (PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT)
+                )
+            ):
+                challenge_id = int(input('Enter challenge ID to target: ').strip())
+
+                if PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT:
+                    selected_challenge = platform.challenges_by_id.get(challenge_id)
+                    if selected_challenge is None:
+                        logger.error(f'Challenge ID {challenge_id} not found.')
+                        sys.exit(1)
+
+                    port = selected_challenge.port
+                    logger.info(
+                        f'Selected challenge {selected_challenge.title} with port {port}.'
+                    )
+        except requests.RequestException as e:
+            logger.error(f'Network error fetching challenges: {e}')
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f'Error fetching challenges: {e}')
+            sys.exit(1)
+
+    if exploit_map:
+        specs = resolve_specs()
+    else:
+        if not selection and not challenges and not SKIP_PORT_INPUT:
+            port = int(input('Enter service port to target: ').strip())
+
+        selections[os.path.basename(filename)] = {
+            'challenge_id': challenge_id,
+            'port': port,
+        }
+
+        # what the fuck is this?
+        rewrite_port = challenge_id == -1 or (
+            PLATFORM in ['gemastik25'] and not SKIP_PORT_INPUT
+        )
+        specs = [ExploitSpec(challenge_id, port, rewrite_port, [filename])]
+
+    _ = threading.Thread(
+        target=refresh_startup_cache,
+        args=(selections, bool(cached)),
+        name='startup-cache',
+        daemon=True,
+    ).start()
+
+    if FARMER_TICK_INFER and not FARMER_BATCH:
+        _ = threading.Thread(target=ticks.probe, name='tick-probe', daemon=True).start()
+
+    while True:
+        budget = RoundBudget(ticks.round_budget())
+        jobs = plan_round(specs)
+        if not jobs:
+            logger.warning('No services found, retrying after sleep...')
+            _ = stop_event.wait(FARMER_WAKE)
+            continue
+
+        if FARMER_BATCH:
+            try:
+                exploit_services_batch(jobs, budget)
+            except KeyboardInterrupt:
+                logger.info(
+                    'Exploitation interrupted by user, killing batch exploit...'
+                )
+                stop_event.set()
+                terminate_childs()
+        elif FARMER_ASYNC:
+            try:
+                asyncio.run(exploit_services_async(jobs, budget))
+            except KeyboardInterrupt:
+                logger.info(
+                    'Exploitation interrupted by user, cancelling pending exploits...'
+                )
+                stop_event.set()
+                terminate_childs()
+        else:
+            workers = (
+                concurrency.limit if FARMER_ADAPTIVE_CONCURRENCY else FARMER_MAX_WORKERS
+            )
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                try:
+                    exploit_services(ex, jobs, budget)
+                except KeyboardInterrupt:
+                    logger.info(
+                        'Exploitation interrupted by user, cancelling pending exploits...'
+                    )
+                    stop_event.set()
+                    terminate_childs()
+                    ex.shutdown(wait=False, cancel_futures=True)
 
         if stop_event.is_set():
             break
 
-        logger.info(f'Sleeping for {FARMER_WAKE} seconds before next round...')
-        time.sleep(FARMER_WAKE)
+        budget.report(len(jobs))
+        exploits.report()
+        if FARMER_CACHE:
+            prune_exploit_cache()
+        seen_flags.report()
+        db_writer.report()
+        _ = concurrency.adjust()
+
+        wake = ticks.next_round() if FARMER_TICK_ALIGN else FARMER_WAKE
+        logger.info(f'Sleeping for {wake:.0f} seconds before next round...')
+        time.sleep(wake)
+
+
+def parse_exploits(args: list[str]) -> dict[int, list[str]]:
+    """Parse `<challenge>=<exploit.py>` arguments, the same key may repeat."""
+    exploits: dict[int, list[str]] = {}
+    for arg in args:
+        key, sep, path = arg.partition('=')
+        if not sep or not key.strip().isdigit():
+            print(
+                f'Invalid exploit argument: {arg} (expected <challenge>=<exploit.py>)'
+            )
+            sys.exit(1)
+
+        if not is_exploit_path(path):
+            print(f'Invalid or missing exploit file: {path}')
+            sys.exit(1)
+
+        exploits.setdefault(int(key), []).append(path)
+
+    return exploits
+
+
+def is_exploit_path(path: str) -> bool:
+    return os.path.isdir(path) or (path.endswith('.py') and os.path.exists(path))
 
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print(f'Usage: python3 {sys.argv[0]} exploit.py')
+        print(f'Usage: python3 {sys.argv[0]} <exploit.py|directory>')
+        print(f'       python3 {sys.argv[0]} <challenge>=<exploit.py|directory> ...')
         sys.exit(1)
 
-    filename = sys.argv[1]
-    if not filename.endswith('.py') or not os.path.exists(filename):
-        print(f'Invalid or missing exploit file: {filename}')
-        sys.exit(1)
+    if len(sys.argv) == 2 and '=' not in sys.argv[1]:
+        filename = sys.argv[1]
+        if not is_exploit_path(filename):
+            print(f'Invalid or missing exploit file: {filename}')
+            sys.exit(1)
+
+        log_file_name = os.path.basename(os.path.normpath(filename)).replace('.py', '')
+    else:
+        exploit_map = parse_exploits(sys.argv[1:])
+        log_file_name = 'multi'
 
-    log_file_name = os.path.basename(filename).replace('.py', '')
     logger = setup_logging('2_farmer', log_file_name)
 
-    session = requests.Session()
-    platform = get_platform(PLATFORM, session, BASE_URL, USERNAME, PASSWORD, TOKEN)
+    session = CoalescingSession(PLATFORM_COALESCE_TTL)
+    platform = CachedPlatform(
+        get_platform(PLATFORM, session, BASE_URL, USERNAME, PASSWORD, TOKEN),
+        PLATFORM_CACHE_TTL,
+    )
 
     setup_database()
+    breakers.load()
+    seen_flags.warm()
+    db_writer.start()
+
+    if FARMER_ASYNC:
+        install_child_watcher()
+
+    if FARMER_FORKSERVER and not FARMER_BATCH:
+        if os.name == 'nt' or FARMER_ASYNC:
+            logger.warning(
+                'Fork server needs fork() and the thread pool runner, using Popen.'
+            )
+        else:
+            exploits.forkserver = True
 
+    exploits.clean()
     try:
         main()
     except KeyboardInterrupt:
         logger.info('Received keyboard interrupt, stopping...')
     finally:
+        for server in forkservers.values():
+            server.stop()
+        exploits.close()
+        db_writer.stop()
         logger.info('Exited cleanly')
@@ -0,0 +1,194 @@
+"""Per-target key-value cache for exploit scripts.
+
+The farmer runs every exploit with this directory on PYTHONPATH and tells it
+where the cache is and which (challenge, team) it is attacking, so state that
+survives ticks (accounts, session cookies, leaked keys, heap offsets) can be
+reused instead of rebuilt every round (on platforms without challenge ids the
+service port stands in for the challenge):
+
+    import farmer_cache
+
+    cache = farmer_cache.open()
+    session = cache.get('session')
+    if session is None:
+        session = register_and_login()
+        cache.set('session', session, ttl=600)
+
+Values are pickled, so anything picklable works. Entries expire after their
+TTL (FARMER_CACHE_TTL by default), values larger than FARMER_CACHE_MAX_VALUE
+bytes are refused, and a scope keeps at most FARMER_CACHE_MAX_ENTRIES entries,
+the least recently written are dropped first. The cache never fails a run:
+if the database cannot be read, `get` returns the default, and `set` returns
+False when the value cannot be stored (with a warning on stderr if it is
+too big or not picklable).
+
+Batch exploits get the scope of each target in the `cache_scope` field of its
+record and pass it to `open`. Run by hand, the cache lives next to this file
+and is scoped by the `ip port` arguments.
+"""
+
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import Any
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'exploit_cache.db'
+)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        scope TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        expires REAL NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (scope, key)
+    )
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    _ = conn.execute('PRAGMA journal_mode=WAL')
+    _ = conn.execute(SCHEMA)
+    return conn
+
+
+def prune(path: str, max_entries: int) -> int:
+    """Drop expired entries and trim every scope to `max_entries`."""
+    with closing(connect(path)) as conn:
+        deleted = conn.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        ).rowcount
+        deleted += conn.execute(
+            """
+            DELETE FROM cache WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY scope ORDER BY updated DESC
+                    ) AS n FROM cache
+                ) WHERE n > ?
+            )
+            """,
+            (max_entries,),
+        ).rowcount
+    return deleted
+
+
+class Cache:
+    def __init__(
+        self,
+        path: str,
+        scope: str,
+        ttl: float,
+        max_value: int,
+        max_entries: int,
+    ) -> None:
+        self.path = path
+        self.scope = scope
+        self.ttl = ttl
+        self.max_value = max_value
+        self.max_entries = max_entries
+        self.conn: sqlite3.Connection | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = connect(self.path)
+        return self.conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            row = (
+                self._conn()
+                .execute(
+                    'SELECT value FROM cache WHERE scope = ? AND key = ? AND expires > ?',
+                    (self.scope, key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            return default
+
+        if row is None:
+            return default
+
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return default
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> bool:
+        try:
+            blob = pickle.dumps(value)
+        except Exception as e:
+            print(f'farmer_cache: cannot store {key!r}: {e}', file=sys.stderr)
+            return False
+
+        if len(blob) > self.max_value:
+            print(
+                f'farmer_cache: not storing {key!r}, {len(blob)} bytes is over'
+                f' the limit of {self.max_value}',
+                file=sys.stderr,
+            )
+            return False
+
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._conn()
+            _ = conn.execute('BEGIN IMMEDIATE')
+            try:
+                _ = conn.execute(
+                    'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                    (self.scope, key, blob, expires, now),
+                )
+                _ = conn.execute(
+                    """
+                    DELETE FROM cache WHERE scope = ? AND key NOT IN (
+                        SELECT key FROM cache WHERE scope = ?
+                        ORDER BY updated DESC LIMIT ?
+                    )
+                    """,
+                    (self.scope, self.scope, self.max_entries),
+                )
+                _ = conn.execute('COMMIT')
+            except BaseException:
+                _ = conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            return False
+        return True
+
+    def delete(self, key: str):
+        try:
+            _ = self._conn().execute(
+                'DELETE FROM cache WHERE scope = ? AND key = ?', (self.scope, key)
+            )
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        """Forget everything cached for this target, e.g. after a reset."""
+        try:
+            _ = self._conn().execute('DELETE FROM cache WHERE scope = ?', (self.scope,))
+        except sqlite3.Error:
+            pass
+
+
+def open(scope: str | None = None) -> Cache:
+    """The cache of the target this run attacks, or of `scope` if given."""
+    env = os.environ
+    if scope is None:
+        scope = env.get('FARMER_CACHE_SCOPE') or ':'.join(sys.argv[1:3])
+
+    return Cache(
+        env.get('FARMER_CACHE') or DEFAULT_PATH,
+        scope,
+        float(env.get('FARMER_CACHE_TTL', 60 * 60)),
+        int(env.get('FARMER_CACHE_MAX_VALUE', 64 * 1024)),
+        int(env.get('FARMER_CACHE_MAX_ENTRIES', 256)),
+    )
@@ -0,0 +1,190 @@
+"""Warm fork server for exploit scripts.
+
+Started by the farmer as ``python3 forkserver.py <socket> <exploit.py>`` from
+the exploit's directory. It imports the exploit's top-level dependencies once,
+then forks a child for every request received on the Unix socket and runs the
+exploit in it as ``__main__``.
+
+Protocol (one connection per run):
+    client -> server: JSON ``{"argv": [...], "env": {...}}`` with the stdout
+                      and stderr pipe ends attached via SCM_RIGHTS
+    server -> client: ``{"pid": <pid>}`` once the child is forked
+    server -> client: ``{"rc": <exit code>}`` once the child is reaped
+"""
+
+import ast
+import importlib
+import json
+import os
+import runpy
+import selectors
+import signal
+import socket
+import sys
+import traceback
+
+
+def preload(filename: str):
+    with open(filename, 'rb') as f:
+        tree = ast.parse(f.read(), filename)
+
+    modules: list[tuple[str, bool]] = []
+    for node in tree.body:
+        # imports guarded by try/except ImportError are still top-level
+        guarded = isinstance(node, ast.Try)
+        for stmt in node.body if guarded else [node]:
+            if isinstance(stmt, ast.Import):
+                modules.extend((alias.name, guarded) for alias in stmt.names)
+            elif isinstance(stmt, ast.ImportFrom) and not stmt.level:
+                if stmt.module:
+                    modules.append((stmt.module, guarded))
+
+    for module, guarded in modules:
+        try:
+            _ = importlib.import_module(module)
+        except Exception as e:
+            if guarded and isinstance(e, ImportError):
+                continue
+            print(f'forkserver: could not preload {module}: {e}', file=sys.stderr)
+
+
+def run_child(argv: list[str], env: dict[str, str], out_fd: int, err_fd: int):
+    os.setsid()
+    for sig in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+        _ = signal.signal(sig, signal.SIG_DFL)
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_fd, 1)
+    os.dup2(err_fd, 2)
+    for fd in (devnull, out_fd, err_fd):
+        os.close(fd)
+
+    sys.argv = argv
+    os.environ.update(env)
+
+    code = 0
+    try:
+        _ = runpy.run_path(argv[0], run_name='__main__')
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve(socket_path: str, filename: str):
+    preload(filename)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+
+    # SIGCHLD wakes the selector through this pair so exits are reported
+    # without polling.
+    wake_r, wake_w = socket.socketpair()
+    wake_r.setblocking(False)
+    wake_w.setblocking(False)
+    _ = signal.set_wakeup_fd(wake_w.fileno())
+    _ = signal.signal(signal.SIGCHLD, lambda *_: None)
+
+    children: dict[int, socket.socket] = {}
+
+    def shutdown(*_):
+        for pid in children:
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+        os._exit(0)
+
+    _ = signal.signal(signal.SIGTERM, shutdown)
+
+    sel = selectors.DefaultSelector()
+    _ = sel.register(listener, selectors.EVENT_READ, 'accept')
+    _ = sel.register(wake_r, selectors.EVENT_READ, 'wake')
+    _ = sel.register(sys.stdin, selectors.EVENT_READ, 'stdin')
+
+    print('ready', flush=True)
+
+    while True:
+        for key, _ in sel.select():
+            if key.data == 'stdin':
+                # The farmer holds the other end; EOF means it is gone.
+                if not os.read(sys.stdin.fileno(), 4096):
+                    shutdown()
+            elif key.data == 'wake':
+                try:
+                    while wake_r.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            elif key.data == 'accept':
+                conn, _ = listener.accept()
+                try:
+                    msg, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+                    request = json.loads(msg)
+                    out_fd, err_fd = fds
+                except Exception as e:
+                    print(f'forkserver: bad request: {e}', file=sys.stderr)
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    sel.close()
+                    for sock in (listener, wake_r, wake_w, *children.values()):
+                        sock.close()
+                    conn.close()
+                    _ = signal.set_wakeup_fd(-1)
+                    run_child(request['argv'], request.get('env') or {}, out_fd, err_fd)
+
+                os.close(out_fd)
+                os.close(err_fd)
+                children[pid] = conn
+                try:
+                    conn.sendall(json.dumps({'pid': pid}).encode() + b'\n')
+                except OSError:
+                    pass
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+
+            conn = children.pop(pid, None)
+            if conn is None:
+                continue
+
+            rc = os.waitstatus_to_exitcode(status)
+            try:
+                conn.sendall(json.dumps({'rc': rc}).encode() + b'\n')
+            except OSError:
+                pass
+            conn.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(f'Usage: python3 {sys.argv[0]} <socket_path> exploit.py')
+        sys.exit(1)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[2])))
+    serve(sys.argv[1], sys.argv[2])
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import importlib
+import threading
+import time
 import typing as t
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
 import requests
+from typing_extensions import override
 
 
 @dataclass
@@ -93,6 +96,208 @@ class BasePlatform:
         raise NotImplementedError()
 
 
+class CoalescingSession(requests.Session):
+    """Session that sends identical GETs only once.
+
+    A GET for a URL and params that are already in flight waits for that
+    request instead of sending its own, and a successful response is reused
+    for `ttl` seconds after it arrived.
+    """
+
+    def __init__(self, ttl: float = 1.0) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.inflight: t.Dict[t.Tuple[str, str], threading.Event] = {}
+        self.responses: t.Dict[
+            t.Tuple[str, str], t.Tuple[float, requests.Response]
+        ] = {}
+        self.lock = threading.Lock()
+
+    @override
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        if method.upper() != 'GET' or self.ttl <= 0:
+            return super().request(method, url, *args, **kwargs)
+
+        key = (str(url), repr((args, kwargs.get('params'))))
+        while True:
+            with self.lock:
+                cached = self.responses.get(key)
+                if cached and time.monotonic() - cached[0] < self.ttl:
+                    return cached[1]
+
+                event = self.inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self.inflight[key] = threading.Event()
+
+            if leader:
+                break
+
+            # the leader's response is cached on success, otherwise retry
+            _ = event.wait()
+
+        try:
+            res = super().request(method, url, *args, **kwargs)
+            if res.ok:
+                now = time.monotonic()
+                with self.lock:
+                    self.responses = {
+                        k: v for k, v in self.responses.items() if now - v[0] < self.ttl
+                    }
+                    self.responses[key] = (now, res)
+            return res
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+
+
+class CachedPlatform(BasePlatform):
+    """Caching wrapper around a platform.
+
+    `get_me` is resolved once per login. Teams, challenges and services are
+    reused for the per-method TTL in `ttls` (seconds, missing means no
+    caching), and teams and challenges are indexed by id and port.
+    """
+
+    def __init__(self, platform: BasePlatform, ttls: t.Dict[str, float]) -> None:
+        self.platform = platform
+        self.ttls = ttls
+        self.me: t.Optional[PlatformUser] = None
+        self.teams_by_id: t.Dict[int, PlatformTeam] = {}
+        self.challenges_by_id: t.Dict[int, PlatformChallenge] = {}
+        self.challenges_by_port: t.Dict[int, PlatformChallenge] = {}
+        self.cache: t.Dict[t.Tuple[str, str], t.Tuple[float, list]] = {}
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> t.Any:
+        # session, token, base_url, ... of the wrapped platform
+        return getattr(self.platform, name)
+
+    @override
+    def login(self) -> str:
+        self.me = None
+        return self.platform.login()
+
+    @override
+    def is_logged_in(self) -> bool:
+        return self.platform.is_logged_in()
+
+    @override
+    def get_me(self) -> PlatformUser:
+        if self.me is None:
+            self.me = self.platform.get_me()
+        return self.me
+
+    @override
+    def list_teams(self) -> t.Iterator[PlatformTeam]:
+        return iter(self._cached('list_teams', '', self._fetch_teams))
+
+    @override
+    def list_challenges(self) -> t.Iterator[PlatformChallenge]:
+        return iter(self._cached('list_challenges', '', self._fetch_challenges))
+
+    @override
+    def get_services(self, filter_: dict) -> t.Iterator[PlatformService]:
+        return iter(
+            self._cached(
+                'get_services',
+                repr(sorted(filter_.items())),
+                lambda: list(self.platform.get_services(filter_)),
+            )
+        )
+
+    @override
+    def submit_flag(self, flag: str) -> t.Union[str, FlagSubmissionResult]:
+        return self.platform.submit_flag(flag)
+
+    @override
+    def submit_flags(
+        self, flags: t.List[str]
+    ) -> t.Union[str, t.List[FlagSubmissionResult]]:
+        return self.platform.submit_flags(flags)
+
+    def restore(self, data: t.Dict[str, t.Any]):
+        """Seed the token and metadata from a `snapshot` of an earlier run."""
+        if data.get('token') and not self.platform.token:
+            self.platform.token = data['token']
+
+        now = time.monotonic()
+        if 'teams' in data:
+            teams = [PlatformTeam(**team) for team in data['teams']]
+            self.teams_by_id = {team.id: team for team in teams}
+            self.cache[('list_teams', '')] = (now, teams)
+        if 'challenges' in data:
+            challenges = [PlatformChallenge(**c) for c in data['challenges']]
+            self._index_challenges(challenges)
+            self.cache[('list_challenges', '')] = (now, challenges)
+
+    def snapshot(self) -> t.Dict[str, t.Any]:
+        """Token and the metadata fetched so far, as plain JSON types."""
+        data: t.Dict[str, t.Any] = {}
+        if self.platform.token:
+            data['token'] = self.platform.token
+        with self.lock:
+            for method, key in (
+                ('list_teams', 'teams'),
+                ('list_challenges', 'challenges'),
+            ):
+                if (method, '') in self.cache:
+                    data[key] = [asdict(item) for item in self.cache[(method, '')][1]]
+        return data
+
+    def refresh(self, relogin: bool = False):
+        """Log in again if asked and refetch the metadata fetched so far.
+
+        If logging in fails, the token we had is kept, it may still work.
+        """
+        if relogin:
+            token, self.platform.token = self.platform.token, ''
+            try:
+                _ = self.login()
+            except Exception:
+                self.platform.token = token
+                raise
+
+        with self.lock:
+            stale = [method for method, _ in self.cache if method != 'get_services']
+            for method in stale:
+                del self.cache[(method, '')]
+
+        for method in stale:
+            _ = list(getattr(self, method)())
+
+    def _fetch_teams(self) -> t.List[PlatformTeam]:
+        teams = list(self.platform.list_teams())
+        self.teams_by_id = {team.id: team for team in teams}
+        return teams
+
+    def _fetch_challenges(self) -> t.List[PlatformChallenge]:
+        challenges = list(self.platform.list_challenges())
+        self._index_challenges(challenges)
+        return challenges
+
+    def _index_challenges(self, challenges: t.List[PlatformChallenge]):
+        self.challenges_by_id = {challenge.id: challenge for challenge in challenges}
+        self.challenges_by_port = {
+            challenge.port: challenge
+            for challenge in challenges
+            if challenge.port is not None
+        }
+
+    def _cached(self, method: str, key: str, fetch: t.Callable[[], list]) -> list:
+        ttl = self.ttls.get(method, 0)
+        with self.lock:
+            hit = self.cache.get((method, key))
+        if hit and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+
+        value = fetch()
+        with self.lock:
+            self.cache[(method, key)] = (time.monotonic(), value)
+        return value
+
+
 def get_platform(
     name: str,
     session: requests.Session,
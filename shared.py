@@ -1,7 +1,12 @@
 import enum
+import json
 import logging
 import os
+import select
+import socket
 import sqlite3
+import threading
+import time
 from dataclasses import dataclass
 from logging.handlers import RotatingFileHandler
 
@@ -15,7 +20,7 @@ PASSWORD = ''
 TOKEN = 'REDACTED'  # for ailurus, and WreckIt
 
 FLAG_PREFIX = 'GEMASTIK18{'
-CAN_BATCH_SUBMIT_FLAG = False
+CAN_BATCH_SUBMIT_FLAG: bool | None = None  # None = detect at runtime
 SKIP_OUR_TEAM = True
 SKIP_OUR_TEAM_IP = '47.128.239.219'  # for WreckIt
 SKIP_PORT_INPUT = False
@@ -26,14 +31,84 @@ TOTAL_TEAM = 10
 FARMER_WAKE = max(8, (INTERVAL // 2) - 8)
 FARMER_TIMEOUT = 32  # max(4, (FARMER_WAKE // 2) - 4)
 FARMER_MAX_WORKERS = 2
+FARMER_ASYNC = False  # drive exploits with asyncio instead of a thread pool
+FARMER_ASYNC_MAX_CONCURRENCY = 64  # max in-flight exploits in asyncio mode
+FARMER_FORKSERVER = False  # fork exploits from a warm parent (POSIX, thread mode)
+FARMER_BATCH = False  # one `exploit.py --batch` process per round, targets on stdin
+FARMER_BATCH_TIMEOUT = FARMER_TIMEOUT * 4
+FARMER_MAX_FLAGS = 0  # kill an exploit once it printed this many flags, 0 = never
+FARMER_OUTPUT_HEAD = 64 * 1024  # bytes of each exploit stream kept from the start
+FARMER_OUTPUT_TAIL = 64 * 1024  # ... and from the end
+FARMER_SPILL_MAX_BYTES = 64 * 1024 * 1024  # full output spill file cap, 0 = off
+FARMER_SPILL_TOTAL_BYTES = 512 * 1024 * 1024  # all spill files, oldest go first
+FARMER_PROBE_TIMEOUT = 2.0  # TCP connect probe before each round, 0 = off
+FARMER_PROBE_DEFER = False  # attack unreachable targets last instead of skipping
+FARMER_ADAPTIVE_TIMEOUT = True  # per-target timeout from its runtime history
+FARMER_TIMEOUT_FLOOR = 4  # adaptive timeouts stay within [floor, FARMER_TIMEOUT]
+FARMER_TIMEOUT_PERCENTILE = 0.99
+FARMER_TIMEOUT_ALPHA = 0.2  # EWMA weight of the newest runtime
+FARMER_TIMEOUT_MIN_SAMPLES = 3  # runs needed before a target's timeout adapts
+FARMER_BREAKER_THRESHOLD = 10  # skip a target after this many flagless runs, 0 = off
+FARMER_BREAKER_COOLDOWN = 3  # rounds an open target is skipped before a trial run
+FARMER_ADAPTIVE_CONCURRENCY = False  # AIMD in-flight limit instead of a fixed one
+FARMER_CONCURRENCY_MIN = 1
+FARMER_CONCURRENCY_MAX = 32
+FARMER_CONCURRENCY_MAX_LOAD = 1.0  # 1-minute load average per CPU before backing off
+FARMER_CONCURRENCY_MAX_TIMEOUT_RATE = 0.5  # share of timed out runs before backing off
+FARMER_WRITER_BATCH = 256  # rows written per transaction by the database writer
+FARMER_WRITER_FLUSH = 0.005  # seconds the writer waits for more rows before a commit
+FARMER_WRITER_QUEUE = 10000  # rows queued before exploit threads have to wait
+FARMER_SEEN_TICKS = 3  # ticks a flag is remembered in memory to skip repeat inserts
+FARMER_SEEN_MAX = 100000  # flags remembered at most, oldest are forgotten first
+FARMER_TICK_ALIGN = False  # start rounds at tick boundaries, not FARMER_WAKE apart
+FARMER_TICK_OFFSET = 0  # ticks start when (unix time - offset) % INTERVAL == 0
+FARMER_TICK_DELAY = 5  # seconds into a tick before attacking, for flags to land
+FARMER_TICK_INFER = False  # find the offset by attacking one target around tick starts
+FARMER_TICK_WINDOW_MAX = 0.25  # share of INTERVAL a flag change window may span
+FARMER_ROUND_BUDGET = 0.9  # share of INTERVAL a round may run before it is cut, 0 = off
+FARMER_PRIORITY = True  # attack targets with the best flag yield first
+FARMER_PRIORITY_WINDOW = INTERVAL * 12  # seconds of history used to rank targets
+FARMER_PRIORITY_EXPLORE = 0.25  # share of slots for the least tried targets
+FARMER_CACHE = True  # per-target key-value cache for exploits, see farmer_cache.py
+FARMER_CACHE_TTL = INTERVAL * 12  # default lifetime of an entry in seconds
+FARMER_CACHE_MAX_VALUE = 64 * 1024  # bytes per pickled value
+FARMER_CACHE_MAX_ENTRIES = 256  # entries per target, least recently written are dropped
+
+PLATFORM_CACHE_TTL = {  # seconds platform results are reused, per method
+    'list_teams': INTERVAL,
+    'list_challenges': INTERVAL,
+    'get_services': 5,
+}
+PLATFORM_COALESCE_TTL = 1.0  # seconds a GET response is shared by identical GETs
+STARTUP_CACHE_MAX_AGE = 60 * 30  # seconds a cached token/team list/selection is trusted
 
 SUBMITTER_WAKE = 1  # max(4, (INTERVAL // TOTAL_TEAM) - 4)
+SUBMITTER_NOTIFY = True  # wake when the farmer stores flags, poll only as a fallback
+SUBMITTER_POLL = 30  # seconds between safety polls while notifications work
+SUBMITTER_CLAIM_MAX = 200  # flags a submitter claims per pass
+SUBMITTER_LEASE = 120  # seconds a claim holds before other submitters may take it
+SUBMITTER_RETRY_BACKOFF = 5  # seconds before an unsettled flag is retried, doubling
+SUBMITTER_RETRY_MAX = 300  # longest wait between retries of one flag
+SUBMITTER_WRITER_FLUSH = 0.05  # seconds results wait for others to share a commit
+SUBMITTER_RATE = {  # submit requests per second as (start, ceiling), per platform
+    'default': (5.0, 20.0),
+}
+SUBMITTER_RATE_MIN = 0.2  # throttling never slows submission below this
+SUBMITTER_RATE_BURST = 4  # requests that may go out back to back
+SUBMITTER_RATE_RECOVERY = 0.05  # requests/s regained per unthrottled response
+SUBMITTER_RATE_SLOW = 3.0  # latency over this many times the usual one means slow down
 SUBMITTER_MAX_WORKERS = 4
-SUBMITTER_BATCH_SIZE = min(100, TOTAL_TEAM * 2)  # ailurus maximum batch submit is 100
+SUBMITTER_BATCH_SIZE = min(100, TOTAL_TEAM * 2)  # first batch size, then adapted
+SUBMITTER_BATCH_MAX = 100  # ailurus maximum batch submit is 100
+SUBMITTER_BATCH_LATENCY = 3.0  # seconds a batch may take before batches shrink
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGS_PATH = os.path.join(BASE_DIR, 'logs')
 DATABASE_PATH = os.path.join(BASE_DIR, 'flags.db')
+STARTUP_CACHE_PATH = os.path.join(BASE_DIR, 'startup_cache.json')
+EXPLOIT_CACHE_PATH = os.path.join(BASE_DIR, 'exploit_cache.db')
+EXPLOIT_VERSIONS_PATH = os.path.join(BASE_DIR, 'exploit_versions')  # one dir per farmer
+SUBMITTER_SOCKET_DIR = os.path.join(BASE_DIR, 'submitters')  # one socket per submitter
 
 
 class FlagStatus(str, enum.Enum):
@@ -114,6 +189,72 @@ def setup_logging(name: str, filename: str = '') -> logging.Logger:
     return logger
 
 
+# Each entry moves the schema up one version, the statements of an entry run
+# in one transaction. Only ever append here.
+MIGRATIONS: list[list[str]] = [
+    [
+        # keep one row per flag, preferring one the platform already judged
+        """
+        DELETE FROM flags WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY flag ORDER BY status = 'unknown', id
+                ) AS n
+                FROM flags
+            )
+            WHERE n > 1
+        )
+        """,
+        'CREATE UNIQUE INDEX IF NOT EXISTS flags_flag ON flags (flag)',
+        'CREATE INDEX IF NOT EXISTS flags_status ON flags (status)',
+        'CREATE INDEX IF NOT EXISTS flags_team_name ON flags (team_name)',
+        'CREATE INDEX IF NOT EXISTS flags_challenge_name ON flags (challenge_name)',
+        'CREATE INDEX IF NOT EXISTS flags_timestamp ON flags (timestamp)',
+        'CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp)',
+    ],
+    [
+        'ALTER TABLE runs ADD COLUMN exploit_version TEXT',
+    ],
+    [
+        # submitters claim flags by leasing them, see submitter.claim_flags
+        'ALTER TABLE flags ADD COLUMN lease_owner TEXT',
+        'ALTER TABLE flags ADD COLUMN lease_expires REAL',
+    ],
+    [
+        # claims prefer flags tried least, see submitter.claim_flags
+        'ALTER TABLE flags ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE flags ADD COLUMN last_attempt REAL',
+    ],
+]
+
+
+def migrate_database(c: sqlite3.Connection):
+    _ = c.execute(
+        'CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'
+    )
+    c.commit()
+
+    while True:
+        # IMMEDIATE so the farmer and submitter starting together can't both
+        # run the same migration
+        _ = c.execute('BEGIN IMMEDIATE')
+        row = c.execute('SELECT MAX(version) FROM schema_version').fetchone()
+        version = row[0] or 0
+        if version >= len(MIGRATIONS):
+            c.commit()
+            return
+
+        try:
+            for statement in MIGRATIONS[version]:
+                _ = c.execute(statement)
+            _ = c.execute('DELETE FROM schema_version')
+            _ = c.execute('INSERT INTO schema_version VALUES (?)', (version + 1,))
+            c.commit()
+        except Exception:
+            c.rollback()
+            raise
+
+
 def setup_database():
     with sqlite3.connect(DATABASE_PATH, timeout=8) as c:
         _ = c.execute("""
@@ -128,4 +269,196 @@ def setup_database():
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        _ = c.execute("""
+            CREATE TABLE IF NOT EXISTS circuit_breakers (
+                challenge_id INTEGER,
+                team_id INTEGER,
+                state TEXT,
+                failures INTEGER,
+                skipped INTEGER,
+                reason TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (challenge_id, team_id)
+            )
+        """)
+        _ = c.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                challenge_id INTEGER,
+                team_id INTEGER,
+                exploit TEXT,
+                flags INTEGER,
+                return_code INTEGER,
+                timeout INTEGER,
+                duration REAL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
         c.commit()
+
+        migrate_database(c)
+
+
+class StartupCache:
+    """Token, competition metadata and target selection of the last start.
+
+    Kept in a JSON file next to the database so a restarted farmer or
+    submitter can skip the login, the metadata requests and the prompts.
+    Each entry is trusted for STARTUP_CACHE_MAX_AGE seconds after it was
+    saved, and only for the platform and URL it was saved for.
+    """
+
+    def __init__(self, path: str = STARTUP_CACHE_PATH) -> None:
+        self.path = path
+        self.owner = f'{PLATFORM} {BASE_URL}'
+        self.lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get('owner') != self.owner:
+            return {}
+        return data.get('entries', {})
+
+    def load(self) -> dict:
+        now = time.time()
+        return {
+            key: entry['value']
+            for key, entry in self._read().items()
+            if now - entry.get('saved_at', 0) < STARTUP_CACHE_MAX_AGE
+        }
+
+    def save(self, **values):
+        with self.lock:
+            entries = self._read()
+            for key, value in values.items():
+                entries[key] = {'value': value, 'saved_at': time.time()}
+
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp, 'w') as f:
+                    json.dump({'owner': self.owner, 'entries': entries}, f)
+                os.replace(tmp, self.path)  # atomic, readers never see half a file
+            except OSError:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+
+
+class FlagNotifier:
+    """Wakes submitters as soon as the farmer has stored new flags.
+
+    Every submitter listens on its own Unix datagram socket in
+    SUBMITTER_SOCKET_DIR, and the farmer sends an empty datagram to each of
+    them after every commit that inserted flags. Sending never blocks or
+    fails the farmer: with no submitter listening, or a full socket buffer
+    (a wakeup is pending then anyway), the datagram is dropped, and
+    submitters still poll now and then for what they missed. Sockets left by
+    submitters that died refuse datagrams and are removed.
+    """
+
+    def __init__(self, directory: str = SUBMITTER_SOCKET_DIR) -> None:
+        self.directory = directory
+        self.path = ''
+        self.sock: socket.socket | None = None
+        self.listening = False
+        self.lock = threading.Lock()
+
+    def _paths(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in names
+            if name.endswith('.sock')
+        ]
+
+    def _send(self, sock: socket.socket, path: str):
+        try:
+            _ = sock.sendto(b'\n', path)
+        except ConnectionRefusedError:
+            # nobody is bound to it any more
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        except OSError:
+            pass
+
+    def notify(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            return
+
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                    self.sock.setblocking(False)
+            except OSError:
+                return
+
+            for path in self._paths():
+                self._send(self.sock, path)
+
+    def listen(self):
+        """Bind this process's socket; raises OSError where that is not possible."""
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError('Unix domain sockets are not available')
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'submitter.{os.getpid()}.sock')
+        try:
+            os.unlink(path)  # a dead process with our pid left it behind
+        except FileNotFoundError:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(path)
+        except OSError:
+            sock.close()
+            raise
+
+        sock.setblocking(False)
+        self.sock = sock
+        self.path = path
+        self.listening = True
+
+        # wake the others once, which also clears sockets of dead submitters
+        for other in self._paths():
+            if other != path:
+                self._send(sock, other)
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep until notified or `timeout` passed; True if notified."""
+        if not self.listening or self.sock is None:
+            time.sleep(timeout)
+            return False
+
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        try:
+            while self.sock.recv(64):  # one wakeup for everything pending
+                pass
+        except BlockingIOError:
+            pass
+        return bool(ready)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+        if self.listening:
+            self.listening = False
+            try:
+                os.unlink(self.path)  # only ever our own socket
+            except OSError:
+                pass
@@ -1,56 +1,411 @@
+import email.utils
 import logging
+import os
+import queue
 import random
+import socket
 import sqlite3
 import sys
 import threading
 import time
+import uuid
 from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 
 import requests
-from platforms.platform import BasePlatform, FlagSubmissionResult, get_platform
+from platforms.platform import CachedPlatform, FlagSubmissionResult, get_platform
 from shared import (
     BASE_URL,
     CAN_BATCH_SUBMIT_FLAG,
     DATABASE_PATH,
     PASSWORD,
     PLATFORM,
+    STARTUP_CACHE_MAX_AGE,
+    SUBMITTER_BATCH_LATENCY,
+    SUBMITTER_BATCH_MAX,
     SUBMITTER_BATCH_SIZE,
+    SUBMITTER_CLAIM_MAX,
+    SUBMITTER_LEASE,
     SUBMITTER_MAX_WORKERS,
+    SUBMITTER_NOTIFY,
+    SUBMITTER_RATE,
+    SUBMITTER_RATE_BURST,
+    SUBMITTER_RATE_MIN,
+    SUBMITTER_RATE_RECOVERY,
+    SUBMITTER_RATE_SLOW,
+    SUBMITTER_RETRY_BACKOFF,
+    SUBMITTER_RETRY_MAX,
+    SUBMITTER_POLL,
     SUBMITTER_WAKE,
+    SUBMITTER_WRITER_FLUSH,
     TOKEN,
     USERNAME,
     Flag,
+    FlagNotifier,
     FlagStatus,
+    StartupCache,
     setup_database,
     setup_logging,
 )
 
 logger: logging.Logger
 session: requests.Session
-platform: 'BasePlatform'
+platform: 'CachedPlatform'
 
 stop_event: threading.Event = threading.Event()
+startup_cache = StartupCache()
+notifier = FlagNotifier()
+
+# identifies this process's leases, also across machines sharing the database
+LEASE_OWNER = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def claim_flags(conn: sqlite3.Connection) -> list[Flag]:
+    """Lease up to SUBMITTER_CLAIM_MAX flags to this submitter.
+
+    Unknown flags and flags whose lease expired (their submitter died or
+    hung) are marked as submitting in one UPDATE, so two submitters never
+    claim the same flag. `renew_leases` keeps them while the pass runs, and
+    they are released by `release_flags` once it is over.
+
+    Flags tried least come first, newest first among them. A flag that comes
+    back unsettled (the platform could not judge it, or we could not send
+    it) waits SUBMITTER_RETRY_BACKOFF seconds, doubling per attempt up to
+    SUBMITTER_RETRY_MAX, so flags that never settle cannot crowd out new ones.
+    """
+    now = time.time()
+    with conn:
+        _ = conn.execute(
+            """
+            UPDATE flags SET
+                status = ?, lease_owner = ?, lease_expires = ?,
+                attempts = attempts + 1, last_attempt = ?
+            WHERE id IN (
+                SELECT id FROM flags
+                WHERE (
+                    status = ? AND (
+                        last_attempt IS NULL
+                        OR last_attempt + MIN(?, ? * (1 << MIN(attempts - 1, 16))) <= ?
+                    )
+                ) OR (status = ? AND lease_expires < ?)
+                ORDER BY attempts, id DESC
+                LIMIT ?
+            )
+            """,
+            (
+                FlagStatus.SUBMITTING,
+                LEASE_OWNER,
+                now + SUBMITTER_LEASE,
+                now,
+                FlagStatus.UNKNOWN,
+                SUBMITTER_RETRY_MAX,
+                SUBMITTER_RETRY_BACKOFF,
+                now,
+                FlagStatus.SUBMITTING,
+                now,
+                SUBMITTER_CLAIM_MAX,
+            ),
+        )
 
+    rows = conn.execute(
+        """
+        SELECT team_id, team_name, challenge_id, challenge_name, flag, status, timestamp
+        FROM flags WHERE status = ? AND lease_owner = ?
+        ORDER BY id
+        """,
+        (FlagStatus.SUBMITTING, LEASE_OWNER),
+    ).fetchall()
+    return [Flag(*row) for row in rows]  # pyright: ignore[reportAny]
+
+
+def renew_leases():
+    """Extend our leases while a pass is still submitting them.
+
+    A pass can outlast SUBMITTER_LEASE when the platform is slow or
+    throttles us, and another submitter must not take over flags that are
+    still in flight. If this process dies, the renewals stop and the leases
+    run out as intended.
+    """
+    conn = sqlite3.connect(DATABASE_PATH, timeout=8)
+    try:
+        while not stop_event.wait(SUBMITTER_LEASE / 3):
+            try:
+                with conn:
+                    _ = conn.execute(
+                        """
+                        UPDATE flags SET lease_expires = ?
+                        WHERE status = ? AND lease_owner = ?
+                        """,
+                        (
+                            time.time() + SUBMITTER_LEASE,
+                            FlagStatus.SUBMITTING,
+                            LEASE_OWNER,
+                        ),
+                    )
+            except sqlite3.Error as e:
+                logger.error(f'Error renewing flag leases: {e}')
+    finally:
+        conn.close()
 
-def update_flag_status(results: list[FlagSubmissionResult]):
+
+def release_flags(conn: sqlite3.Connection):
+    """Hand flags still leased to us back, to be retried by any submitter."""
     try:
-        with sqlite3.connect(DATABASE_PATH, timeout=8) as conn:
-            updated: list[str] = []
-            for result in results:
-                _ = conn.execute(
-                    'UPDATE flags SET status=? WHERE flag=? AND status=?',
-                    (result.status, result.flag, FlagStatus.UNKNOWN),
+        with conn:
+            cursor = conn.execute(
+                """
+                UPDATE flags SET status = ?, lease_owner = NULL, lease_expires = NULL
+                WHERE status = ? AND lease_owner = ?
+                """,
+                (FlagStatus.UNKNOWN, FlagStatus.SUBMITTING, LEASE_OWNER),
+            )
+    except sqlite3.Error as e:
+        logger.error(f'Error releasing flags: {e}')
+        return
+
+    if cursor.rowcount:
+        logger.info(f'Released {cursor.rowcount} unsubmitted flag(s).')
+
+
+class StatusWriter:
+    """Single thread that stores submission results.
+
+    Results of futures finishing within `SUBMITTER_WRITER_FLUSH` seconds of
+    each other are written with one `executemany` in one transaction, on
+    one connection, so the write lock the farmer also needs is taken rarely
+    and briefly. An update is stale when the flag was already judged, by an
+    earlier answer or by another submitter.
+    """
+
+    # the platform's answer wins even if our lease ran out
+    SQL = """
+        UPDATE flags SET status = ?, lease_owner = NULL, lease_expires = NULL
+        WHERE flag = ? AND status IN (?, ?)
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[tuple[str, str] | None] = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.run, name='status-writer', daemon=True
+        )
+        self.changed = 0
+        self.stale = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Write what is still queued and stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=30)
+
+    def add(self, results: list[FlagSubmissionResult]):
+        for result in results:
+            self.queue.put((result.status, result.flag))
+
+    def flush(self):
+        """Wait until everything queued so far is written."""
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def run(self):
+        conn = sqlite3.connect(DATABASE_PATH, timeout=8)
+        try:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                if item is None:
+                    self.queue.task_done()
+                    break
+
+                batch = [item]
+                flush_at = time.monotonic() + SUBMITTER_WRITER_FLUSH
+                while True:
+                    try:
+                        item = self.queue.get(
+                            timeout=max(0.0, flush_at - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.queue.task_done()
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                try:
+                    self.write(conn, batch)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            conn.close()
+
+    def write(self, conn: sqlite3.Connection, batch: list[tuple[str, str]]):
+        rows = [
+            (status, flag, FlagStatus.UNKNOWN, FlagStatus.SUBMITTING)
+            for status, flag in batch
+        ]
+        for attempt in range(3):
+            try:
+                with conn:
+                    changed = conn.executemany(self.SQL, rows).rowcount
+                break
+            except sqlite3.Error as e:
+                if attempt < 2:
+                    time.sleep(0.1 * 2**attempt)
+                    continue
+
+                logger.error(f'Error updating {len(batch)} flag status(es): {e}')
+                with self.lock:
+                    self.errors += len(batch)
+                return
+
+        with self.lock:
+            self.changed += changed
+            self.stale += len(batch) - changed
+
+    def report(self):
+        with self.lock:
+            changed, self.changed = self.changed, 0
+            stale, self.stale = self.stale, 0
+            errors, self.errors = self.errors, 0
+
+        if changed or stale or errors:
+            logger.info(
+                f'Status: {changed} flag(s) updated, {stale} stale update(s),'
+                f' {errors} error(s).'
+            )
+
+
+status_writer = StatusWriter()
+
+
+class SubmitLimiter:
+    """Token bucket shared by all submit threads, adapting to the platform.
+
+    Starts at the platform's rate from SUBMITTER_RATE. Responses are seen
+    through a session hook: a 429 or 503 halves the rate and honours
+    `Retry-After`, while any other 5xx or a response much slower than usual
+    cuts the rate by a fifth. At most one cut per second, so a burst of
+    in-flight requests failing together counts once. Every other response
+    wins back SUBMITTER_RATE_RECOVERY requests/s, up to the ceiling.
+    """
+
+    def __init__(self, rate: float, ceiling: float) -> None:
+        self.rate = rate
+        self.ceiling = ceiling
+        self.tokens = float(SUBMITTER_RATE_BURST)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_cut = 0.0
+        self.latency = 0.0  # EWMA of normal responses
+        self.samples = 0
+        self.reported = rate
+        self.local = threading.local()  # status of each thread's last response
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Wait for a token; False if the submitter is stopping."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    SUBMITTER_RATE_BURST,
+                    self.tokens + (now - self.updated) * self.rate,
                 )
-                updated.append(f'{result.flag}-{result.status}')
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+            if stop_event.wait(wait):
+                return False
+
+    def last_status(self) -> int | None:
+        """HTTP status of this thread's last response, forgotten once read.
+
+        Platforms hide it in many ways (an error message, an empty answer,
+        unparsable JSON), the hook sees it either way.
+        """
+        status, self.local.status = getattr(self.local, 'status', None), None
+        return status
+
+    def on_response(self, res: requests.Response, *args, **kwargs):
+        self.local.status = res.status_code
+        latency = res.elapsed.total_seconds()
+        with self.lock:
+            if res.status_code in (429, 503):
+                self._cut(0.5, f'HTTP {res.status_code}')
+                pause = retry_after(res)
+                if pause:
+                    self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                    self.tokens = 0
+            elif res.status_code >= 500:
+                self._cut(0.8, f'HTTP {res.status_code}')
+            elif (
+                self.samples >= 5
+                # jitter of fast responses is not the platform slowing down
+                and latency > max(0.25, self.latency * SUBMITTER_RATE_SLOW)
+            ):
+                self._cut(0.8, f'{latency:.2f}s response')
+            else:
+                self.samples += 1
+                self.latency += (latency - self.latency) / min(self.samples, 10)
+                self.rate = min(self.ceiling, self.rate + SUBMITTER_RATE_RECOVERY)
+
+    def _cut(self, factor: float, reason: str):
+        now = time.monotonic()
+        if now - self.last_cut < 1:
+            return
+
+        self.last_cut = now
+        rate = max(SUBMITTER_RATE_MIN, self.rate * factor)
+        logger.warning(
+            f'Platform throttling ({reason}), submit rate {self.rate:.1f}/s -> {rate:.1f}/s'
+        )
+        self.rate = rate
+
+    def report(self):
+        with self.lock:
+            rate, changed = self.rate, abs(self.rate - self.reported) >= 0.5
+            if changed:
+                self.reported = rate
+
+        if changed:
+            logger.info(f'Submit rate is now {rate:.1f}/s')
 
-            conn.commit()
 
-            if updated:
-                for entry in range(0, len(updated), 4):
-                    logger.info('\t' + ', '.join(updated[entry : entry + 4]))
-    except Exception as e:
-        logger.error(f'\tError updating flag status in database: {e}')
+def retry_after(res: requests.Response) -> float:
+    """Seconds asked for by a `Retry-After` header, capped at a minute."""
+    value = res.headers.get('Retry-After', '').strip()
+    if not value:
+        return 0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0
+        seconds = date.timestamp() - time.time()
+    return min(max(0.0, seconds), 60.0)
+
+
+limiter = SubmitLimiter(*SUBMITTER_RATE.get(PLATFORM, SUBMITTER_RATE['default']))
+
+
+def update_flag_status(results: list[FlagSubmissionResult]):
+    status_writer.add(results)
+
+    updated = [f'{result.flag}-{result.status}' for result in results]
+    for entry in range(0, len(updated), 4):
+        logger.info('\t' + ', '.join(updated[entry : entry + 4]))
 
 
 @dataclass
@@ -58,6 +413,12 @@ class SubmitOutcome:
     errors: list[Exception]
     results: list[FlagSubmissionResult]
     message: str | None = None
+    duration: float = 0.0  # of the answered request
+    throttled: bool = False  # the platform answered 429 or 5xx
+
+
+def is_throttled(status: int | None) -> bool:
+    return status is not None and (status == 429 or status >= 500)
 
 
 # FIXME: Bad retry concept, because what if the error is different each
@@ -67,18 +428,31 @@ def submit_flags(
 ) -> SubmitOutcome:
     exceptions: list[Exception] = []
     for attempt in range(1, retries + 1):
+        if not limiter.acquire():
+            break
+
+        _ = limiter.last_status()
         try:
+            start = time.monotonic()
             if isinstance(flags, str):
                 res = platform.submit_flag(flags)
             else:
                 res = platform.submit_flags(flags)
+            duration = time.monotonic() - start
+            throttled = is_throttled(limiter.last_status())
 
             if isinstance(res, str):
-                return SubmitOutcome([], [], res)
+                return SubmitOutcome([], [], res, duration, throttled)
 
-            return SubmitOutcome([], res if isinstance(res, list) else [res])
+            return SubmitOutcome(
+                [],
+                res if isinstance(res, list) else [res],
+                duration=duration,
+                throttled=throttled,
+            )
         except requests.RequestException as e:
             status = getattr(e.response, 'status_code', None)
+            throttled = is_throttled(limiter.last_status())
             exceptions.append(e)
 
             # Only retry on connection/timeouts or 5xx errors
@@ -97,29 +471,99 @@ def submit_flags(
                 continue
 
             # For 4xx errors, don't bother retrying - it's our fault
-            return SubmitOutcome(exceptions, [])
+            return SubmitOutcome(exceptions, [], throttled=throttled)
         except Exception as e:
             exceptions.append(e)
-            return SubmitOutcome(exceptions, [])
+            return SubmitOutcome(
+                exceptions, [], throttled=is_throttled(limiter.last_status())
+            )
 
-    # This will never happen
+    # only reached when stopping while waiting for the rate limiter
     return SubmitOutcome(exceptions, [])
 
 
+class BatchSizer:
+    """Whether the platform takes batches, and how big.
+
+    With CAN_BATCH_SUBMIT_FLAG = None the first batches find out: only a
+    NotImplementedError or an HTTP 404/405 from `submit_flags` turns
+    batching off for the run, other failures may be transient. The size
+    doubles after a full batch answered completely within
+    SUBMITTER_BATCH_LATENCY, up to SUBMITTER_BATCH_MAX, and halves after a
+    failed, partly answered or slow one. Outcomes of batches sent at an
+    older size are not counted again.
+    """
+
+    def __init__(self, supported: bool | None) -> None:
+        self.supported = supported
+        self.size = max(1, min(SUBMITTER_BATCH_SIZE, SUBMITTER_BATCH_MAX))
+
+    def observe(
+        self, size: int, batch: list[Flag], outcome: SubmitOutcome, missing: int
+    ):
+        if self.supported is not True and any(
+            isinstance(e, NotImplementedError)
+            or getattr(getattr(e, 'response', None), 'status_code', None) in (404, 405)
+            for e in outcome.errors
+        ):
+            if self.supported is None:
+                logger.warning(
+                    'Platform has no batch submission, submitting one by one.'
+                )
+            self.supported = False
+            return
+
+        failed = (
+            bool(outcome.errors) or outcome.message is not None or missing == len(batch)
+        )
+        if self.supported is None and not failed:
+            logger.info('Batch submission works.')
+            self.supported = True
+
+        if size != self.size:
+            return
+
+        if failed or missing or outcome.duration > SUBMITTER_BATCH_LATENCY:
+            self.resize(max(1, self.size // 2))
+        elif len(batch) >= self.size:
+            self.resize(min(SUBMITTER_BATCH_MAX, self.size * 2))
+
+    def resize(self, size: int):
+        if size != self.size:
+            logger.info(f'Batch size {self.size} -> {size}')
+            self.size = size
+
+
+batcher = BatchSizer(CAN_BATCH_SUBMIT_FLAG)
+
+
+def throttled(outcome: SubmitOutcome) -> bool:
+    """Whether the platform turned the request away for load, not content."""
+    return outcome.throttled or any(
+        isinstance(e, (requests.Timeout, requests.ConnectionError))
+        or is_throttled(getattr(getattr(e, 'response', None), 'status_code', None))
+        for e in outcome.errors
+    )
+
+
 def submit_flags_batch(ex: ThreadPoolExecutor, flags: list[Flag]):
+    size = batcher.size
     futures: dict[Future[SubmitOutcome], list[Flag]] = {}
-    for i in range(0, len(flags), SUBMITTER_BATCH_SIZE):
+    for i in range(0, len(flags), size):
         if stop_event.is_set():
             break
 
-        batch = flags[i : i + SUBMITTER_BATCH_SIZE]
+        batch = flags[i : i + size]
         future = ex.submit(submit_flags, [flag.flag for flag in batch])
         futures[future] = batch
 
-        _ = stop_event.wait(random.uniform(0.1, 0.25))
-
+    # flags of failed batches, and those a batch answer left out, are
+    # tried one by one so a bad batch does not hold them back a pass;
+    # throttled batches are not, more requests would only make it worse,
+    # their flags go out as a batch again next pass
+    fallback: list[Flag] = []
     for future in as_completed(futures):
-        batch = futures[future]  # May be useful for future? (i mean future not future)
+        batch = futures[future]
         result: SubmitOutcome = future.result()
 
         logger.info(
@@ -128,14 +572,30 @@ def submit_flags_batch(ex: ThreadPoolExecutor, flags: list[Flag]):
 
         if result.errors:
             logger.error(f'\tFailed to submit flags: {result.errors}')
+            batcher.observe(size, batch, result, len(batch))
+            if not throttled(result):
+                fallback.extend(batch)
             continue
 
         if result.message is not None:
             logger.error(f'\tSubmission error: {result.message}')
+            batcher.observe(size, batch, result, len(batch))
+            if not throttled(result):
+                fallback.extend(batch)
             continue
 
         update_flag_status(result.results)
 
+        answered = {r.flag for r in result.results}
+        missing = [flag for flag in batch if flag.flag not in answered]
+        batcher.observe(size, batch, result, len(missing))
+        if not throttled(result):
+            fallback.extend(missing)
+
+    if fallback and not stop_event.is_set():
+        logger.info(f'Submitting {len(fallback)} flag(s) of failed batches one by one.')
+        submit_flags_individual(ex, fallback)
+
 
 def submit_flags_individual(ex: ThreadPoolExecutor, flags: list[Flag]):
     futures: dict[Future[SubmitOutcome], Flag] = {}
@@ -146,8 +606,6 @@ def submit_flags_individual(ex: ThreadPoolExecutor, flags: list[Flag]):
         future = ex.submit(submit_flags, flag.flag)
         futures[future] = flag
 
-        _ = stop_event.wait(random.uniform(0.1, 0.25))
-
     for future in as_completed(futures):
         _ = futures[future]  # May be useful for future?
         result = future.result()
@@ -165,7 +623,25 @@ def submit_flags_individual(ex: ThreadPoolExecutor, flags: list[Flag]):
         update_flag_status(result.results)
 
 
+def refresh_startup_cache(stale: bool):
+    """Keep the cached token fresh while the submitter runs."""
+    while True:
+        try:
+            if stale:
+                platform.refresh(relogin=not TOKEN and bool(USERNAME and PASSWORD))
+            startup_cache.save(**platform.snapshot())
+        except Exception as e:
+            logger.warning(f'Could not refresh startup cache: {e}')
+
+        if stop_event.wait(STARTUP_CACHE_MAX_AGE / 2):
+            return
+        stale = True
+
+
 def main():
+    cached = startup_cache.load()
+    platform.restore(cached)
+
     try:
         _ = platform.login()
         logger.info(f'Logged in, token: {platform.token}')
@@ -173,24 +649,42 @@ def main():
         logger.critical(f'Failed to log in: {e}')
         sys.exit(1)
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    _ = threading.Thread(
+        target=refresh_startup_cache,
+        args=('token' in cached,),
+        name='startup-cache',
+        daemon=True,
+    ).start()
+
+    if SUBMITTER_NOTIFY:
+        try:
+            notifier.listen()
+            logger.info(f'Waiting for new flags on {notifier.path}')
+        except OSError as e:
+            logger.warning(
+                f'Cannot listen for new flags, polling every {SUBMITTER_WAKE}s: {e}'
+            )
+
+    conn = sqlite3.connect(DATABASE_PATH, timeout=8)
+    status_writer.start()
+    _ = threading.Thread(target=renew_leases, name='lease-renewal', daemon=True).start()
 
     try:
         logger.info('Starting flag submission loop...')
         while True:
             # logger.info('Checking for flags to submit...')
 
-            _ = cursor.execute(
-                'SELECT * FROM flags WHERE status = ?', (FlagStatus.UNKNOWN,)
-            )
-            flags = [Flag(*row[1:]) for row in cursor.fetchall()]  # pyright: ignore[reportAny]
+            try:
+                flags = claim_flags(conn)
+            except sqlite3.Error as e:
+                logger.error(f'Error claiming flags: {e}')
+                flags = []
 
             if flags:
                 logger.info(f'Found {len(flags)} flags to submit.')
                 with ThreadPoolExecutor(max_workers=SUBMITTER_MAX_WORKERS) as ex:
                     try:
-                        if CAN_BATCH_SUBMIT_FLAG:
+                        if batcher.supported is not False:
                             submit_flags_batch(ex, flags)
                         else:
                             submit_flags_individual(ex, flags)
@@ -205,6 +699,11 @@ def main():
                             # For Python versions < 3.9 which do not support cancel_futures
                             ex.shutdown(wait=True)
 
+                # results must be stored before the leftovers are released
+                status_writer.flush()
+                status_writer.report()
+                limiter.report()
+                release_flags(conn)
                 logger.info('Waiting for next submission...')
             # else:
             #     logger.info('No flags to submit.')
@@ -212,22 +711,28 @@ def main():
             if stop_event.is_set():
                 break
 
-            # logger.info(
-            #     f'Sleeping for {SUBMITTER_WAKE} seconds before next submission...'
-            # )
-            time.sleep(SUBMITTER_WAKE)
+            # While flags are coming in, look again soon to retry failed ones;
+            # otherwise sleep until the farmer reports new flags.
+            _ = notifier.wait(
+                SUBMITTER_POLL if notifier.listening and not flags else SUBMITTER_WAKE
+            )
     except KeyboardInterrupt:
         raise
     finally:
-        cursor.close()
+        status_writer.stop()
+        release_flags(conn)
         conn.close()
+        notifier.close()
 
 
 if __name__ == '__main__':
     logger = setup_logging('1_submitter')
 
     session = requests.Session()
-    platform = get_platform(PLATFORM, session, BASE_URL, USERNAME, PASSWORD, TOKEN)
+    session.hooks['response'].append(limiter.on_response)
+    platform = CachedPlatform(
+        get_platform(PLATFORM, session, BASE_URL, USERNAME, PASSWORD, TOKEN), {}
+    )
 
     setup_database()
 
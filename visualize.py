@@ -4,11 +4,18 @@ from collections import Counter
 
 from shared import Flag
 
+SORT_COLUMNS = {
+    'team': 'team_name',
+    'challenge': 'challenge_name',
+    'status': 'status',
+    'timestamp': 'timestamp',
+}
+
 
 def main():
     parser = argparse.ArgumentParser(description='List flags with simple output.')
     parser.add_argument(
-        '--sort', choices=['team', 'challenge', 'status'], help='Sort by field'
+        '--sort', choices=list(SORT_COLUMNS), help='Sort by field'
     )
     parser.add_argument('--filter-status', help='Show only flags with this status')
     args = parser.parse_args()
@@ -16,9 +23,16 @@ def main():
     conn = sqlite3.connect('flags.db', timeout=10)
     cursor = conn.cursor()
 
-    cursor.execute(
-        'SELECT team_id, team_name, challenge_id, challenge_name, flag, status, timestamp FROM flags'
-    )
+    # Filtering and sorting happen in SQL, where the indexes can serve them
+    query = 'SELECT team_id, team_name, challenge_id, challenge_name, flag, status, timestamp FROM flags'
+    params: list[str] = []
+    if args.filter_status:
+        query += ' WHERE status = ?'
+        params.append(args.filter_status.lower())
+    if args.sort:
+        query += f' ORDER BY {SORT_COLUMNS[args.sort]}'
+
+    cursor.execute(query, params)
     rows = cursor.fetchall()
 
     flags = [
@@ -34,20 +48,6 @@ def main():
         for row in rows
     ]
 
-    # Filtering
-    if args.filter_status:
-        flags = [f for f in flags if f.status.lower() == args.filter_status.lower()]
-
-    # Sorting
-    if args.sort == 'team':
-        flags.sort(key=lambda f: f.team_name)
-    elif args.sort == 'challenge':
-        flags.sort(key=lambda f: f.challenge_name)
-    elif args.sort == 'status':
-        flags.sort(key=lambda f: f.status)
-    elif args.sort == 'timestamp':
-        flags.sort(key=lambda f: f.timestamp)
-
     # Prepare data for simple table
     headers = [
         'Team ID',